@@ -0,0 +1,150 @@
+"""Compare the torch and int8 ONNX embedding backends.
+
+Measures single-query latency, batch throughput and how often both
+backends retrieve the same top-k documents from the same corpus.
+
+    python -m benchmarks.embedding_backends
+    python -m benchmarks.embedding_backends --model paraphrase-MiniLM-L3-v2 --runs 200
+"""
+import re
+import time
+import json
+import argparse
+import statistics
+import numpy as np
+
+from shared.utils.embedding_backend import create_embedding_backend
+from services.knowledge_agent.snapshot import load_snapshot
+
+DEFAULT_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+EXTRA_QUERIES = [
+    "What is Maquininha Smart?",
+    "Quais as taxas da maquininha?",
+    "Como funciona o Pix parcelado?",
+    "How do I receive payments on the same day?",
+    "Can I sell online with a payment link?",
+    "Qual o rendimento da conta digital?",
+    "How do I issue a boleto?",
+    "What is Tap to Pay?",
+    "Is there a card for my business account?",
+    "What's the weather in Rio today?",
+]
+
+FALLBACK_CORPUS = [
+    "A Maquininha Smart aceita cartões de débito, crédito e Pix com as menores taxas.",
+    "Receba na hora: o dinheiro das suas vendas cai na conta em segundos.",
+    "Transforme seu celular em maquininha com o Tap to Pay, sem custo adicional.",
+    "Crie links de pagamento e venda pelas redes sociais ou WhatsApp.",
+    "Monte sua loja online grátis e receba por Pix, cartão e boleto.",
+    "Emita boletos e acompanhe cobranças pela gestão de cobrança.",
+    "A conta digital rende mais que a poupança, sem tarifa de manutenção.",
+    "Conta PJ gratuita com cartão de crédito empresarial.",
+    "Pix parcelado: seu cliente paga em parcelas e você recebe à vista.",
+    "Empréstimo com crédito pré-aprovado para o seu negócio.",
+    "You can reset your password by going to the settings page.",
+    "Our refund policy allows you to request a refund within 30 days.",
+]
+
+
+def load_queries(path="test-cases.md"):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            queries = re.findall(r'"message":\s*"([^"]+)"', f.read())
+    except OSError:
+        queries = []
+    return queries + EXTRA_QUERIES
+
+
+def load_corpus(snapshot_dir):
+    snapshot = load_snapshot(snapshot_dir) if snapshot_dir else None
+    if snapshot is None:
+        return FALLBACK_CORPUS
+    return [chunk["content"] for chunk in snapshot[1]]
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def bench_backend(embedder, queries, corpus, runs, batch_size):
+    embedder.encode(queries[:2])  # warm up
+
+    latencies = []
+    for i in range(runs):
+        started = time.perf_counter()
+        embedder.encode(queries[i % len(queries)])
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    batch = (queries * (batch_size // len(queries) + 1))[:batch_size]
+    started = time.perf_counter()
+    for _ in range(max(1, runs // batch_size)):
+        embedder.encode(batch)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "throughput_per_s": round(max(1, runs // batch_size) * batch_size / elapsed, 1),
+        "query_vectors": embedder.encode(queries, normalize_embeddings=True),
+        "corpus_vectors": embedder.encode(corpus, normalize_embeddings=True),
+    }
+
+
+def top_k(query_vectors, corpus_vectors, k):
+    scores = query_vectors @ corpus_vectors.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--runs", type=int, default=100, help="single-query encodes per backend")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--k", type=int, default=3, help="top-k used for retrieval agreement")
+    parser.add_argument("--snapshot-dir", default="data/knowledge_snapshots",
+                        help="use the current knowledge base snapshot as corpus when present")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    queries = load_queries()
+    corpus = load_corpus(args.snapshot_dir)
+    k = min(args.k, len(corpus))
+
+    results = {}
+    for backend in ("torch", "onnx"):
+        embedder = create_embedding_backend(args.model, backend)
+        results[embedder.identifier] = bench_backend(embedder, queries, corpus, args.runs, args.batch_size)
+
+    if len(results) < 2:
+        raise SystemExit("The ONNX backend could not be loaded, install optimum[onnxruntime] to compare.")
+    base, other = results.values()
+    cosine = np.sum(base["query_vectors"] * other["query_vectors"], axis=1)
+    base_top, other_top = top_k(base["query_vectors"], base["corpus_vectors"], k), top_k(other["query_vectors"], other["corpus_vectors"], k)
+    report = {
+        "model": args.model,
+        "queries": len(queries),
+        "corpus": len(corpus),
+        "backends": {
+            backend_id: {key: value for key, value in result.items() if not key.endswith("_vectors")}
+            for backend_id, result in results.items()
+        },
+        "agreement": {
+            "mean_query_cosine": round(float(np.mean(cosine)), 4),
+            "top1_match": round(float(np.mean(base_top[:, 0] == other_top[:, 0])), 4),
+            f"top{k}_overlap": round(float(np.mean([len(set(a) & set(b)) / k for a, b in zip(base_top, other_top)])), 4),
+        },
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{args.model}: {len(queries)} queries, {len(corpus)} documents")
+    for backend_id, result in report["backends"].items():
+        print(f"  {backend_id:<60} p50 {result['p50_ms']:>7.2f} ms  p95 {result['p95_ms']:>7.2f} ms  {result['throughput_per_s']:>8.1f} texts/s")
+    for name, value in report["agreement"].items():
+        print(f"  {name:<20} {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Replayable load test against the router's /ask endpoint.
+
+The workload is sampled (with a fixed seed) from the requests in
+test-cases.md, or replayed from a JSONL file written by --save-workload.
+Requests are sent by --concurrency workers. Latency percentiles and
+throughput are reported per agent path, i.e. the agent the router chose.
+
+    python -m benchmarks.load_test --url http://localhost:8000 --requests 500 --concurrency 20
+    python -m benchmarks.load_test --requests 200 --save-workload data/workload.jsonl
+    python -m benchmarks.load_test --workload data/workload.jsonl --concurrency 50 --json
+"""
+import re
+import time
+import json
+import random
+import asyncio
+import argparse
+from collections import defaultdict
+import httpx
+import numpy as np
+
+
+def load_test_cases(path="test-cases.md"):
+    """Every JSON request body in test-cases.md with a user_id and a message."""
+    with open(path, "r", encoding="utf-8") as f:
+        blocks = re.findall(r"```json\s*(\{.*?\})\s*```", f.read(), re.DOTALL)
+    cases = []
+    for block in blocks:
+        try:
+            body = json.loads(block)
+        except json.JSONDecodeError:
+            continue
+        if "user_id" in body and "message" in body:
+            cases.append({"user_id": body["user_id"], "message": body["message"]})
+    return cases
+
+
+def build_workload(cases, total, seed):
+    rng = random.Random(seed)
+    return [rng.choice(cases) for _ in range(total)]
+
+
+def read_workload(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def write_workload(path, workload):
+    with open(path, "w", encoding="utf-8") as f:
+        for item in workload:
+            f.write(json.dumps(item, ensure_ascii=False) + "\n")
+
+
+def agent_path(body):
+    """The agent the router chose, from the first agent_workflow entry."""
+    try:
+        return next(iter(body["agent_workflow"][0]["tool_calls"].values()))
+    except (KeyError, IndexError, TypeError, StopIteration):
+        return "unknown"
+
+
+async def worker(client, url, queue, results):
+    while True:
+        try:
+            item = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        started = time.perf_counter()
+        try:
+            response = await client.post(url, json=item)
+            body = response.json()
+            path = "error" if response.status_code != 200 or "error" in body else agent_path(body)
+        except (httpx.HTTPError, ValueError):
+            path = "error"
+        results.append((path, time.perf_counter() - started))
+
+
+def summarize(results, elapsed):
+    by_path = defaultdict(list)
+    for path, latency in results:
+        by_path[path].append(latency)
+    by_path["all"] = [latency for _, latency in results]
+
+    report = {}
+    for path, latencies in sorted(by_path.items()):
+        ms = np.asarray(latencies) * 1000
+        report[path] = {
+            "requests": len(latencies),
+            "rps": round(len(latencies) / elapsed, 2),
+            "mean_ms": round(float(ms.mean()), 1),
+            "p50_ms": round(float(np.percentile(ms, 50)), 1),
+            "p95_ms": round(float(np.percentile(ms, 95)), 1),
+            "p99_ms": round(float(np.percentile(ms, 99)), 1),
+        }
+    return report
+
+
+async def run(args):
+    if args.workload:
+        workload = read_workload(args.workload)
+    else:
+        workload = build_workload(load_test_cases(args.test_cases), args.requests, args.seed)
+    if args.save_workload:
+        write_workload(args.save_workload, workload)
+
+    queue = asyncio.Queue()
+    for item in workload:
+        queue.put_nowait(item)
+
+    results = []
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*[worker(client, f"{args.url}/ask", queue, results) for _ in range(args.concurrency)])
+        elapsed = time.perf_counter() - started
+
+    return {
+        "url": args.url,
+        "requests": len(workload),
+        "concurrency": args.concurrency,
+        "elapsed_s": round(elapsed, 2),
+        "paths": summarize(results, elapsed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000", help="router base URL")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42, help="seed for sampling the workload")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--test-cases", default="test-cases.md")
+    parser.add_argument("--workload", help="replay this JSONL workload instead of sampling one")
+    parser.add_argument("--save-workload", help="write the workload to this JSONL file")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{report['requests']} requests to {report['url']}/ask at concurrency {report['concurrency']} in {report['elapsed_s']} s")
+    print(f"  {'path':<22}{'requests':>9}{'rps':>9}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for path, stats in report["paths"].items():
+        print(f"  {path:<22}{stats['requests']:>9}{stats['rps']:>9}{stats['mean_ms']:>10}{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Local stand-ins for every external API the swarm calls.
+
+Serves an OpenAI/Azure-compatible chat completions endpoint (any path
+ending in /chat/completions, streaming included), a Slack webhook, the
+newsdata.io API and a search API, each with configurable latency. Point
+the services at it with:
+
+    API_ENDPOINT=http://localhost:9000/openai/deployments/mock/chat/completions
+    SLACK_WEBHOOK_URL=http://localhost:9000/slack
+    NEWS_API_URL=http://localhost:9000/news
+    SEARCH_API_URL=http://localhost:9000/search
+
+    python -m benchmarks.mock_upstreams --port 9000 --llm-latency-ms 800 --llm-jitter-ms 200
+"""
+import re
+import time
+import json
+import uuid
+import random
+import asyncio
+import argparse
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+config = {
+    "llm_latency_ms": 500,
+    "llm_jitter_ms": 100,
+    "stream_chunk_ms": 20,
+    "tool_latency_ms": 100,
+    "tool_calls": True,
+}
+
+app = FastAPI()
+
+# Keyword routing that mirrors the intent of router_agent_prompt.txt
+ROUTES = [
+    ("GeneralAgent", r"news|notícias|noticias|prime minister|largest bank|weather|stolen|hack|fraud"),
+    ("CustomerSupportAgent", r"login|log in|password|payment status|order status|refund|not able|unable|declined"),
+]
+
+# Tool call triggers: (tool name, pattern, argument builder)
+TOOL_TRIGGERS = [
+    ("send_slack_notification_tool", r"stolen|hack|fraud", lambda user_id, q: {"user_id": user_id, "message": q}),
+    ("get_news_tool", r"news|notícias|noticias", lambda user_id, q: {"topic": q}),
+    ("db_query_tool", r"payment status|order status", lambda user_id, q: {"user_id": user_id, "fields": [f for f in ("payment_status", "order_status") if f.split("_")[0] in q.lower()]}),
+    ("contact_support_tool", r"login|log in|not able|unable", lambda user_id, q: {"user_id": user_id, "question": q}),
+]
+
+
+async def sleep_ms(latency_ms, jitter_ms=0):
+    await asyncio.sleep(max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000)
+
+
+def route(text):
+    for agent_name, pattern in ROUTES:
+        if re.search(pattern, text, re.IGNORECASE):
+            return agent_name
+    return "KnowledgeAgent"
+
+
+def parse_user_message(text):
+    """(user_id, question) from the agents' user message formats."""
+    match = re.match(r"User (\S+) asks: (.*)", text, re.DOTALL)
+    if match:
+        return match.group(1), match.group(2)
+    match = re.match(r"Question: (.*) User ID: (\S+)", text, re.DOTALL)
+    if match:
+        return match.group(2), match.group(1)
+    return "client000", text.replace("QUESTION: ", "")
+
+
+def pick_tool_call(tools, text):
+    tool_names = {tool["function"]["name"] for tool in tools or []}
+    user_id, question = parse_user_message(text)
+    for name, pattern, build_args in TOOL_TRIGGERS:
+        if name in tool_names and re.search(pattern, question, re.IGNORECASE):
+            return {
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+                "type": "function",
+                "function": {"name": name, "arguments": json.dumps(build_args(user_id, question), ensure_ascii=False)}
+            }
+    return None
+
+
+RAW_RESPONSE_LINE = re.compile(r"^\[raw_response\][ \t]*\r?$", re.MULTILINE)
+
+
+def reply_for(body):
+    """Return the assistant message the real model would roughly produce."""
+    messages = body.get("messages", [])
+    system = next((m["content"] for m in messages if m["role"] == "system"), "")
+    user = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+
+    if system.startswith("You are a classification agent"):
+        return {"role": "assistant", "content": route(user)}
+    # The block starts at the "[raw_response]" line; the marker also appears inline in the instructions
+    raw_block = RAW_RESPONSE_LINE.split(user, 1)
+    if len(raw_block) == 2:
+        raw = raw_block[1].strip()
+        return {"role": "assistant", "content": f"Of course! {raw}"}
+
+    tool_call = pick_tool_call(body.get("tools"), user) if config["tool_calls"] else None
+    if tool_call:
+        return {"role": "assistant", "content": None, "tool_calls": [tool_call]}
+    return {"role": "assistant", "content": f"Here is a mock answer to: {parse_user_message(user)[1]}"}
+
+
+def completion(message):
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": "mock",
+        "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if message.get("tool_calls") else "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    }
+
+
+async def stream_completion(message):
+    # Time to first token, then one word per chunk
+    await sleep_ms(config["llm_latency_ms"] / 2, config["llm_jitter_ms"])
+    for word in re.findall(r"\S+\s*", message["content"] or ""):
+        chunk = {"choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+        yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+        await sleep_ms(config["stream_chunk_ms"])
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/{path:path}/chat/completions")
+async def chat_completions(path: str, request: Request):
+    body = await request.json()
+    message = reply_for(body)
+    if body.get("stream"):
+        return StreamingResponse(stream_completion(message), media_type="text/event-stream")
+    await sleep_ms(config["llm_latency_ms"], config["llm_jitter_ms"])
+    return completion(message)
+
+
+@app.post("/slack")
+async def slack_webhook():
+    await sleep_ms(config["tool_latency_ms"])
+    return {"ok": True}
+
+
+@app.get("/news")
+async def news(q: str = ""):
+    await sleep_ms(config["tool_latency_ms"])
+    return {"status": "success", "results": [{"title": f"Mock headline {i + 1} about {q}"} for i in range(10)]}
+
+
+@app.get("/search")
+async def search(q: str = ""):
+    await sleep_ms(config["tool_latency_ms"])
+    return [{"body": f"Mock search result {i + 1} for {q}"} for i in range(3)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--llm-latency-ms", type=float, default=config["llm_latency_ms"])
+    parser.add_argument("--llm-jitter-ms", type=float, default=config["llm_jitter_ms"])
+    parser.add_argument("--stream-chunk-ms", type=float, default=config["stream_chunk_ms"])
+    parser.add_argument("--tool-latency-ms", type=float, default=config["tool_latency_ms"])
+    parser.add_argument("--no-tool-calls", action="store_true", help="always answer with content instead of tool calls")
+    args = parser.parse_args()
+
+    config.update(
+        llm_latency_ms=args.llm_latency_ms,
+        llm_jitter_ms=args.llm_jitter_ms,
+        stream_chunk_ms=args.stream_chunk_ms,
+        tool_latency_ms=args.tool_latency_ms,
+        tool_calls=not args.no_tool_calls
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
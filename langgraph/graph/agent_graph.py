@@ -10,7 +10,7 @@ from tools.custom_tools import (
     db_query_tool, contact_support_tool, send_slack_notification_tool,
     get_news_tool, duckduckgo_search_tool, faq_tool, rag_tool
 )
-from shared.utils.load_prompt import load_prompt_template
+from shared.utils.load_prompt import format_prompt
 
 class AgentGraph:
     def __init__(self):
@@ -39,8 +39,7 @@ class AgentGraph:
         # Now it will, because this function receives the initial graph state.
         message_content = state["messages"][-1][1]
 
-        router_prompt = load_prompt_template("shared/prompts/router_agent_prompt.txt")
-        prompt = router_prompt.format(messages=message_content)
+        prompt = format_prompt("shared/prompts/router_agent_prompt.txt", messages=message_content)
         response = self.llm.invoke(prompt)
         return response.content.strip()
 
@@ -59,8 +58,7 @@ class AgentGraph:
 
 
         user_question = state["messages"][0][1] # Get original user question
-        personality_prompt_template = load_prompt_template("shared/prompts/personality_layer_prompt.txt")
-        prompt = personality_prompt_template.format(raw_response=raw_response, user_message=user_question)
+        prompt = format_prompt("shared/prompts/personality_layer_prompt.txt", raw_response=raw_response, user_message=user_question)
         final_response = self.llm.invoke(prompt)
         return {"messages": [final_response]}
 
@@ -1,6 +1,6 @@
 import os
 from langchain_openai import AzureChatOpenAI
-from shared.utils.load_prompt import load_prompt_template
+from shared.utils.load_prompt import format_prompt
 from graph.agent_graph import AgentGraph
 import langchain
 
@@ -14,10 +14,10 @@ class PersonalityLayer:
             api_version="2024-08-01-preview",
             azure_deployment="gpt-4o-chatgmp",
         )
-        self.prompt_template = load_prompt_template("shared/prompts/personality_layer_prompt.txt")
+        self.prompt_template_path = "shared/prompts/personality_layer_prompt.txt"
 
     def run(self, raw_response, question):
-        prompt = self.prompt_template.format(raw_response=raw_response, user_message=question)
+        prompt = format_prompt(self.prompt_template_path, raw_response=raw_response, user_message=question)
         response = self.llm.invoke(prompt)
         return response.content
 
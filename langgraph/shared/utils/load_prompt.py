@@ -1,7 +1,133 @@
-def load_prompt_template(path):
+import os
+import time
+import string
+import logging
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Every template under PROMPTS_DIR is loaded once, then served from memory
+PROMPTS_DIR = os.getenv("PROMPTS_DIR", "shared/prompts")
+# Seconds between checks for edited prompt files, 0 disables hot reload
+PROMPT_RELOAD_INTERVAL = float(os.getenv("PROMPT_RELOAD_INTERVAL", "2"))
+
+
+class PromptTemplate:
+    """A prompt file's text with its {fields} parsed once at load time."""
+
+    def __init__(self, path, text, mtime=None):
+        self.path = path
+        self.text = text
+        self.mtime = mtime
+        self.fields = set()
+        self._parts = []  # (literal text, field name or None)
+        try:
+            for literal, field, spec, conversion in string.Formatter().parse(text):
+                if field is not None:
+                    self.fields.add(field)
+                    if spec or conversion or not field.isidentifier():
+                        # Anything beyond plain {name} goes through str.format
+                        self._parts = None
+                if self._parts is not None:
+                    self._parts.append((literal, field))
+        except ValueError:
+            # Unbalanced braces: format() raises the same error str.format would
+            self._parts = None
+
+    def format(self, **kwargs):
+        if self._parts is None:
+            return self.text.format(**kwargs)
+        return "".join(
+            literal if field is None else f"{literal}{kwargs[field]}"
+            for literal, field in self._parts
+        )
+
+
+class PromptRegistry:
+    """In-memory prompt templates, reloaded by a watcher thread when their file changes."""
+
+    def __init__(self, base_dir: str = PROMPTS_DIR, reload_interval: float = PROMPT_RELOAD_INTERVAL):
+        self.base_dir = base_dir
+        self.reload_interval = reload_interval
+        self._templates = {}  # absolute path -> PromptTemplate
+        self._lock = threading.Lock()
+        self._watcher = None
+
+        if os.path.isdir(base_dir):
+            for name in sorted(os.listdir(base_dir)):
+                if name.endswith(".txt"):
+                    self.get(os.path.join(base_dir, name))
+        logger.info(f"Loaded {len(self._templates)} prompt templates from {base_dir}")
+
+    def _read(self, key):
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                return f.read()
+            mtime = os.stat(key).st_mtime
+            with open(key, 'r', encoding='utf-8') as f:
+                return PromptTemplate(key, f.read(), mtime)
         except Exception as e:
-            print(f"Failed to load prompt template: {e}")
-            return ""
\ No newline at end of file
+            logger.error(f"Failed to load prompt template: {e}")
+            return None
+
+    def get(self, path):
+        """Return the PromptTemplate for path, or None if it can't be read."""
+        key = os.path.abspath(path)
+        template = self._templates.get(key)
+        if template is None:
+            with self._lock:
+                template = self._templates.get(key) or self._read(key)
+                if template is not None:
+                    self._templates[key] = template
+                self._start_watcher()
+        return template
+
+    def reload_changed(self):
+        """Reload templates whose file changed on disk, return how many were reloaded."""
+        reloaded = 0
+        for key, template in list(self._templates.items()):
+            try:
+                mtime = os.stat(key).st_mtime
+            except OSError:
+                continue  # Keep serving the last good version
+            if mtime != template.mtime:
+                updated = self._read(key)
+                if updated is not None:
+                    self._templates[key] = updated
+                    reloaded += 1
+                    logger.info(f"Reloaded prompt template {key}")
+        return reloaded
+
+    def _watch(self):
+        while True:
+            time.sleep(self.reload_interval)
+            self.reload_changed()
+
+    def _start_watcher(self):
+        if self.reload_interval > 0 and self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, name="prompt-watcher", daemon=True)
+            self._watcher.start()
+
+
+_registry = None
+
+
+def get_prompt_registry() -> PromptRegistry:
+    global _registry
+    if _registry is None:
+        _registry = PromptRegistry()
+    return _registry
+
+
+def get_prompt_template(path) -> PromptTemplate:
+    return get_prompt_registry().get(path) or PromptTemplate(path, "")
+
+
+def load_prompt_template(path):
+    return get_prompt_template(path).text
+
+
+def format_prompt(path, **kwargs):
+    return get_prompt_template(path).format(**kwargs)
+
@@ -1,28 +1,30 @@
 import os
 import json
-import sqlite3
-import requests
-import numpy as np
-from sentence_transformers import SentenceTransformer, util
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import time
+import asyncio
+import threading
+import httpx
 from dotenv import load_dotenv
 import logging
 
 
-from shared.utils.load_prompt import load_prompt_template
+from shared.utils.load_prompt import load_prompt_template, fuse_personality
 from shared.utils.tools import db_query, contact_support
+from shared.utils.llm_client import get_llm_client
+from shared.utils.prefetch import PrefetchStore
+from shared.utils.inference import run_inference
+from shared.utils.embedding_backend import create_embedding_backend
+from shared.utils.metrics import track_stage
+from shared.utils.tool_calls import run_tool_calls
+from services.customer_support_agent.faq_index import FaqIndex
+from services.customer_support_agent.user_store import UserStore, USER_FIELDS
+from services.customer_support_agent.email_outbox import EmailOutbox
 
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# get environment variables for API access
-API_ENDPOINT = os.getenv("API_ENDPOINT")
-API_KEY       = os.getenv("API_KEY")
-
 #get environment variables for email support
 support_email = os.getenv("SUPPORT_EMAIL")
 smtp_server = os.getenv("SMTP_SERVER")  
@@ -30,6 +32,33 @@ smtp_port = os.getenv("SMTP_PORT")
 sender_email = os.getenv("SENDER_EMAIL")
 sender_password = os.getenv("SENDER_PASSWORD")
 
+# Support emails go through a SQLite outbox and are sent by a background worker
+SUPPORT_OUTBOX_PATH = os.getenv("SUPPORT_OUTBOX_PATH", "data/support_outbox.db")
+SUPPORT_OUTBOX_BATCH_SIZE = int(os.getenv("SUPPORT_OUTBOX_BATCH_SIZE", "20"))
+SUPPORT_OUTBOX_POLL_INTERVAL = float(os.getenv("SUPPORT_OUTBOX_POLL_INTERVAL", "5"))
+SUPPORT_OUTBOX_MAX_ATTEMPTS = int(os.getenv("SUPPORT_OUTBOX_MAX_ATTEMPTS", "8"))
+SUPPORT_OUTBOX_RETRY_BASE = float(os.getenv("SUPPORT_OUTBOX_RETRY_BASE", "5"))
+SUPPORT_OUTBOX_RETRY_MAX = float(os.getenv("SUPPORT_OUTBOX_RETRY_MAX", "600"))
+SMTP_IDLE_TIMEOUT = float(os.getenv("SMTP_IDLE_TIMEOUT", "60"))
+
+# FAQ source and ANN settings
+FAQ_PATH = os.getenv("FAQ_PATH")
+FAQ_ANN_MIN_SIZE = int(os.getenv("FAQ_ANN_MIN_SIZE", "2000"))
+# Seconds between checks of FAQ_PATH for edits, 0 disables reloading
+FAQ_RELOAD_INTERVAL = float(os.getenv("FAQ_RELOAD_INTERVAL", "30"))
+
+# Persistent user data store (SQLite in WAL mode) and its per-user row cache
+USER_DB_PATH = os.getenv("USER_DB_PATH", "data/user_data.db")
+USER_DB_POOL_SIZE = int(os.getenv("USER_DB_POOL_SIZE", "4"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+
+# Style LLM answers in the same generation instead of a separate PersonalityLayer call
+SUPPORT_FUSED_PERSONALITY = os.getenv("SUPPORT_FUSED_PERSONALITY", "false").lower() == "true"
+
+# "torch" or "onnx" (int8-quantized ONNX Runtime)
+SUPPORT_EMBEDDING_BACKEND = os.getenv("SUPPORT_EMBEDDING_BACKEND", "torch")
+
 # List of FAQs (Dummy data for testing)
 faq_list = [
     {"question": "How can I Contact Support?", "answer": "You can contact support by support@example.com"},
@@ -37,57 +66,54 @@ faq_list = [
     {"question": "What is policy on refunds?", "answer": "Our refund policy allows you to request a refund within 30 days of purchase if you are not satisfied with the product."}
 ]
 
-def get_faq_questions() -> list:
-    return [f["question"] for f in faq_list]
-
-def lookup_faq_answer(question: str) -> str:
-    for f in faq_list:
-        if f["question"] == question:
-            return f["answer"]
-    return "No answer available for this question."
+# Read FAQ_PATH (JSON list of {"question", "answer"}), raising OSError or ValueError if it is unreadable or malformed
+def read_faqs() -> list:
+    with open(FAQ_PATH, "r", encoding="utf-8") as f:
+        faqs = json.load(f)
+    if not isinstance(faqs, list) or not all(
+        isinstance(faq, dict) and isinstance(faq.get("question"), str) and isinstance(faq.get("answer"), str)
+        for faq in faqs
+    ):
+        raise ValueError('expected a JSON list of {"question", "answer"} objects')
+    return faqs
 
+# Load FAQs at startup, falling back to faq_list
+def load_faqs() -> list:
+    if not FAQ_PATH:
+        return faq_list
+    try:
+        faqs = read_faqs()
+        logger.info(f"Loaded {len(faqs)} FAQs from {FAQ_PATH}")
+        return faqs
+    except (OSError, ValueError) as e:
+        logger.error(f"Failed to load FAQs from {FAQ_PATH}: {e}")
+        return faq_list
 
-DB_SCHEMA = """
-CREATE TABLE IF NOT EXISTS user_data (
-    user_id TEXT PRIMARY KEY,
-    email TEXT,
-    user_name TEXT,
-    payment_status TEXT,
-    order_status TEXT
-);
-"""
 
 def init_db():
-    conn = sqlite3.connect(":memory:")   # Using in-memory database for testing
-    cur = conn.cursor()
-    cur.execute(DB_SCHEMA)
-    cur.executemany(
-        "INSERT OR IGNORE INTO user_data VALUES (?,?,?,?,?);",
-        [
-            ("client789","c789@example.com","John Doe","Paid","Shipped"),
-            ("client790","c790@example.com","Jane Doe","Pending","Processing")
-        ]
-    )
-    conn.commit()
-    logger.info("Database initialized with user data.")
-    return conn
-
-# db_query function to retrieve a single field for a user from the database
-def db_query_tool(conn, user_id: str, field: str) -> str:
-    logger.info(f"Querying database for user_id: {user_id}")    
-    cur = conn.cursor()
-    
-    cur.execute(
-        "SELECT {} FROM user_data WHERE user_id=?;".format(field),
-        (user_id,)
-    )
-    row = cur.fetchone()
+    return UserStore(USER_DB_PATH, USER_DB_POOL_SIZE, USER_CACHE_TTL, USER_CACHE_SIZE)
 
-    return row[0] if row and row[0] is not None else "Not found"
+# db_query function to retrieve one or more fields for a user in a single call
+def db_query_tool(store: UserStore, user_id: str, fields: list = None, field: str = None) -> str:
+    logger.info(f"Querying database for user_id: {user_id}")
+    # "field" is the single-column form older prompts still produce; the LLM sometimes sends "fields" as a string
+    if isinstance(fields, str):
+        fields = [fields]
+    requested = fields or ([field] if field else None)
+    values = store.lookup(user_id, requested)
+    if values is None:
+        return "Not found"
+    unknown = [name for name in requested or [] if name not in USER_FIELDS]
+    if len(values) == 1 and not unknown:
+        return next(iter(values.values()))
+    lines = [f"{name}: {value}" for name, value in values.items()]
+    if unknown:
+        lines.append(f"Unknown field(s): {', '.join(unknown)}. Available fields: {', '.join(USER_FIELDS)}.")
+    return "\n".join(lines)
 
-# contact_support function to send an email to support team
-def contact_support_tool(user_id: str, question: str) -> str:
-    logger.info(f"Sending support request for user {user_id} with question: {question}")    
+# contact_support function to queue an email to the support team, delivered by the outbox worker
+async def contact_support_tool(outbox: EmailOutbox, user_id: str, question: str) -> str:
+    logger.info(f"Queueing support request for user {user_id} with question: {question}")
     # Create the email content
     subject = f"Support Request from User {user_id}"
     body = f"""
@@ -101,34 +127,28 @@ def contact_support_tool(user_id: str, question: str) -> str:
     Best regards,
     Your Support System
     """
-    
-    # Create the MIME message
-    message = MIMEMultipart()
-    message["From"] = sender_email
-    message["To"] = support_email
-    message["Subject"] = subject
-    
-    # Attach the body to the email
-    message.attach(MIMEText(body, "plain"))
-    
+
     try:
-        # Connect to the SMTP server and send the email
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()  # Secure the connection
-            server.login(sender_email, sender_password)  
-            server.sendmail(sender_email, support_email, message.as_string())  # Send the email
-        logger.info(f"Slack notification sent to support team for user {user_id}.")
-        return f"Our support team will contact you soon regarding your question: “{question}” (user: {user_id})."
-    
+        ticket_id = await outbox.enqueue(user_id, subject, body)
+        logger.info(f"Support ticket {ticket_id} queued for user {user_id}.")
+        return f"Our support team will contact you soon regarding your question: “{question}” (user: {user_id}, ticket: {ticket_id})."
+
     except Exception as e:
-        logger.error(f"Error occurred while sending the email: {e}")
-        return f"An error occurred while sending the email: {str(e)}"        
+        logger.error(f"Error occurred while queueing the email: {e}")
+        return f"An error occurred while sending the email: {str(e)}"
+
 
+def init_outbox():
+    return EmailOutbox(
+        SUPPORT_OUTBOX_PATH, smtp_server, smtp_port, sender_email, sender_password, support_email,
+        batch_size=SUPPORT_OUTBOX_BATCH_SIZE,
+        poll_interval=SUPPORT_OUTBOX_POLL_INTERVAL,
+        max_attempts=SUPPORT_OUTBOX_MAX_ATTEMPTS,
+        retry_base=SUPPORT_OUTBOX_RETRY_BASE,
+        retry_max=SUPPORT_OUTBOX_RETRY_MAX,
+        idle_timeout=SMTP_IDLE_TIMEOUT
+    )
 
-HEADERS = {
-    "Content-Type": "application/json",
-    "api-key": API_KEY
-}
 
 # Tools definition
 TOOLS = [db_query, contact_support]
@@ -136,72 +156,106 @@ TOOLS = [db_query, contact_support]
 # SupportAgent class to handle customer support queries
 class SupportAgent:
     def __init__(self, threshold: float = 0.7):
-        self.conn = init_db()
-        self.model = SentenceTransformer('paraphrase-MiniLM-L3-v2')
+        self.users = init_db()
+        self.outbox = init_outbox()
+        self.model = create_embedding_backend('paraphrase-MiniLM-L3-v2', SUPPORT_EMBEDDING_BACKEND)
         self.threshold = threshold
+        # FAQ embeddings are computed once here, not per request
+        self._faq_mtime = self._faq_file_mtime()
+        self.faq_index = self._build_faq_index()
+        if FAQ_PATH and FAQ_RELOAD_INTERVAL > 0:
+            threading.Thread(target=self._watch_faqs, name="faq-watcher", daemon=True).start()
         self.prompt_template_path = "shared/prompts/customer_support_prompt.txt"
+        self.llm = get_llm_client()
+        self.prefetches = PrefetchStore()
 
-    # Function to find the most similar FAQ question    
+    # Function to find the most similar FAQ
     def _most_similar_faq(self, question: str):
-        faqs = get_faq_questions()
-        q_emb = self.model.encode(question)
-        f_embs = self.model.encode(faqs)
-        sims = util.pytorch_cos_sim(q_emb, f_embs).numpy()[0]
-        idx = int(np.argmax(sims))
-        return (faqs[idx], sims[idx]) if sims[idx] > self.threshold else (None, 0)
-
-    def handle(self, user_id: str, question: str) -> str:
+        with track_stage("retrieval"):
+            q_emb = self.model.encode(question, normalize_embeddings=True)
+            return self.faq_index.search(q_emb, self.threshold)
+
+    def _build_faq_index(self) -> FaqIndex:
+        index = FaqIndex(
+            encode=lambda texts: self.model.encode(texts, normalize_embeddings=True),
+            ann_min_size=FAQ_ANN_MIN_SIZE
+        )
+        index.add(load_faqs())
+        return index
+
+    def _faq_file_mtime(self):
+        try:
+            return os.stat(FAQ_PATH).st_mtime if FAQ_PATH else None
+        except OSError:
+            return None
+
+    # Apply an edited FAQ_PATH to the index: only added or changed entries are encoded, dropped ones are removed
+    def _reload_faqs(self):
+        faqs = read_faqs()
+        current = {(faq["question"], faq["answer"]): faq["id"] for faq in self.faq_index.entries()}
+        wanted = dict.fromkeys((faq["question"], faq["answer"]) for faq in faqs)
+        added = self.faq_index.add([{"question": q, "answer": a} for q, a in wanted if (q, a) not in current])
+        removed = self.faq_index.remove([faq_id for key, faq_id in current.items() if key not in wanted])
+        logger.info(f"Reloaded FAQs from {FAQ_PATH}: {len(added)} added, {removed} removed, {len(self.faq_index)} total")
+
+    # FAQ_PATH is the only source of FAQs. A file that fails to load keeps the current FAQs and is retried next check
+    def _watch_faqs(self):
+        while True:
+            time.sleep(FAQ_RELOAD_INTERVAL)
+            try:
+                mtime = self._faq_file_mtime()
+                if mtime is not None and mtime != self._faq_mtime:
+                    self._reload_faqs()
+                    self._faq_mtime = mtime
+            except Exception as e:
+                logger.error(f"Failed to reload FAQs from {FAQ_PATH}, keeping the current ones: {e}")
+
+    # Start the FAQ match speculatively while the router is still classifying
+    def prefetch(self, request_id: str, question: str):
+        self.prefetches.start(request_id, run_inference(self._most_similar_faq, question))
+
+    async def _run_tool(self, function_name, function_args):
+        if function_name == "db_query_tool":
+            return await asyncio.to_thread(db_query_tool, self.users, **function_args)
+        if function_name == "contact_support_tool":
+            return await contact_support_tool(self.outbox, **function_args)
+        return "Unknown tool called"
+
+    async def handle(self, user_id: str, question: str, request_id: str = None) -> str:
         # 1. FAQ check
-        matched, score = self._most_similar_faq(question)
+        prefetched = await self.prefetches.take(request_id) if request_id else None
+        if prefetched is None:
+            prefetched = await run_inference(self._most_similar_faq, question)
+        matched, score = prefetched
         if matched:
             logger.info("Found matching FAQ")
-            return {"tool_name":"faq_answer","Response":lookup_faq_answer(matched)}
+            return {"tool_name":"faq_answer","Response":matched["answer"]}
 
         system_prompt = load_prompt_template(self.prompt_template_path)
+        if SUPPORT_FUSED_PERSONALITY:
+            system_prompt = fuse_personality(system_prompt)
 
         # 2. Tool calling via OpenAI API
-        payload = {
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"User {user_id} asks: {question}"}
-            ],
-            "tools": TOOLS,
-            "tool_choice": "auto"
-        }
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": f"User {user_id} asks: {question}"}
+        ]
 
         try:
             logger.info("Sending request to OpenAI API for support query processing.")
-            resp = requests.post(
-                API_ENDPOINT,
-                headers=HEADERS,
-                json=payload
-            )
-            resp.raise_for_status()
-            response_data = resp.json()
-            
-            message = response_data["choices"][0]["message"]
+            with track_stage("agent_llm"):
+                message = await self.llm.chat_message(messages, tools=TOOLS)
             
             # Check if the model wants to use tools
             if message.get("tool_calls"):
-                tool_call = message["tool_calls"][0] 
-                function_name = tool_call["function"]["name"]
-                function_args = json.loads(tool_call["function"]["arguments"])
-                
-                # Execute the appropriate function
-                if function_name == "db_query_tool":
-                    result = db_query_tool(self.conn,**function_args)
-                elif function_name == "contact_support_tool":
-                    result = contact_support_tool(**function_args)
-                else:
-                    result = "Unknown tool called"
-                
-                return {"tool_name":function_name,"Response":result}
+                # Every tool call runs concurrently, e.g. an order lookup plus a support ticket
+                return await run_tool_calls(message["tool_calls"], self._run_tool)
             
             # If no tool calls, return the regular response
             elif message.get("content"):
-                return {"tool_name":"llm_response","Response": message["content"]}
+                return {"tool_name":"llm_response","Response": message["content"],"personality_applied": SUPPORT_FUSED_PERSONALITY}
             
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Request error: {e}")
             return "Sorry, there was an error processing your request."
         except json.JSONDecodeError as e:
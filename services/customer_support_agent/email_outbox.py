@@ -0,0 +1,228 @@
+import os
+import time
+import uuid
+import asyncio
+import sqlite3
+import smtplib
+import logging
+import threading
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from shared.utils.resilience import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    ticket_id TEXT PRIMARY KEY,
+    user_id TEXT,
+    subject TEXT,
+    body TEXT,
+    status TEXT,
+    attempts INTEGER DEFAULT 0,
+    next_attempt_at REAL,
+    last_error TEXT,
+    created_at REAL,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+"""
+
+
+class EmailOutbox:
+    """SQLite-backed queue of support emails, delivered by a background worker.
+
+    enqueue() stores the email and returns its ticket ID right away. The
+    worker sends due emails in batches over one SMTP session that stays
+    open while there is traffic, and reschedules failures with jittered
+    exponential backoff until `max_attempts`. aclose() lets the email being
+    sent finish before closing the session; emails still queued when the
+    service stops are sent after the next start.
+
+    Ticket status: "queued" (waiting or retrying), "sent" or "failed".
+    """
+
+    def __init__(self, path: str, smtp_server: str, smtp_port: int, sender_email: str, sender_password: str,
+                 recipient: str, batch_size: int = 20, poll_interval: float = 5, max_attempts: int = 8,
+                 retry_base: float = 5, retry_max: float = 600, idle_timeout: float = 60):
+        self.path = path
+        self.smtp_server = smtp_server
+        self.smtp_port = smtp_port
+        self.sender_email = sender_email
+        self.sender_password = sender_password
+        self.recipient = recipient
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry = RetryPolicy(base_delay=retry_base, max_delay=retry_max)
+        self.idle_timeout = idle_timeout
+        self.sent = 0
+        self.send_errors = 0
+        self._smtp = None
+        self._last_used = 0.0
+        self._worker = None
+        self._wakeup = None
+        self._stopping = threading.Event()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL;")
+        self._db.executescript(OUTBOX_SCHEMA)
+
+    # Storage, called from worker threads
+
+    def _insert(self, user_id, subject, body):
+        ticket_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._db_lock, self._db:
+            self._db.execute(
+                "INSERT INTO outbox (ticket_id, user_id, subject, body, status, attempts, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, 'queued', 0, ?, ?);",
+                (ticket_id, user_id, subject, body, now, now)
+            )
+        return ticket_id
+
+    def _due(self):
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT * FROM outbox WHERE status='queued' AND next_attempt_at<=? ORDER BY next_attempt_at LIMIT ?;",
+                (time.time(), self.batch_size)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def _mark_sent(self, ticket_id):
+        with self._db_lock, self._db:
+            self._db.execute("UPDATE outbox SET status='sent', sent_at=?, last_error=NULL WHERE ticket_id=?;", (time.time(), ticket_id))
+
+    def _mark_failed(self, row, error):
+        attempts = row["attempts"] + 1
+        status = "failed" if attempts >= self.max_attempts else "queued"
+        next_attempt_at = time.time() + self.retry.backoff(attempts - 1)
+        with self._db_lock, self._db:
+            self._db.execute(
+                "UPDATE outbox SET status=?, attempts=?, next_attempt_at=?, last_error=? WHERE ticket_id=?;",
+                (status, attempts, next_attempt_at, str(error), row["ticket_id"])
+            )
+        if status == "failed":
+            logger.error(f"Giving up on support ticket {row['ticket_id']} after {attempts} attempts: {error}")
+
+    def status(self, ticket_id: str):
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT ticket_id, user_id, status, attempts, last_error, created_at, sent_at FROM outbox WHERE ticket_id=?;",
+                (ticket_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def counts(self) -> dict:
+        with self._db_lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status;").fetchall()
+        return {status: count for status, count in rows}
+
+    # SMTP, called from worker threads
+
+    def _session(self):
+        if self._smtp is None:
+            server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=30)
+            server.starttls()  # Secure the connection
+            server.login(self.sender_email, self.sender_password)
+            self._smtp = server
+            logger.info(f"Opened SMTP session to {self.smtp_server}")
+        return self._smtp
+
+    def _close_session(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+    def _send(self, row):
+        message = MIMEMultipart()
+        message["From"] = self.sender_email
+        message["To"] = self.recipient
+        message["Subject"] = row["subject"]
+        message.attach(MIMEText(row["body"], "plain"))
+        try:
+            self._session().sendmail(self.sender_email, self.recipient, message.as_string())
+        except smtplib.SMTPServerDisconnected:
+            # The server dropped the idle session, reconnect once
+            self._smtp = None
+            self._session().sendmail(self.sender_email, self.recipient, message.as_string())
+
+    def _send_batch(self, rows):
+        for row in rows:
+            if self._stopping.is_set():
+                break
+            try:
+                self._send(row)
+            except Exception as e:
+                self.send_errors += 1
+                logger.error(f"Error sending support ticket {row['ticket_id']}: {e}")
+                self._mark_failed(row, e)
+                if not isinstance(e, smtplib.SMTPRecipientsRefused):
+                    # The session is likely broken, start over on the next attempt
+                    self._close_session()
+                continue
+            self.sent += 1
+            self._mark_sent(row["ticket_id"])
+        self._last_used = time.monotonic()
+
+    def _close_idle_session(self):
+        if self._smtp is not None and time.monotonic() - self._last_used > self.idle_timeout:
+            logger.info("Closing idle SMTP session")
+            self._close_session()
+
+    # Worker
+
+    def start(self):
+        """Start the delivery worker; must be called with the event loop running."""
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            try:
+                rows = await asyncio.to_thread(self._due)
+                if rows:
+                    await asyncio.to_thread(self._send_batch, rows)
+                    continue
+                await asyncio.to_thread(self._close_idle_session)
+            except Exception as e:
+                logger.error(f"Outbox worker error: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def enqueue(self, user_id: str, subject: str, body: str) -> str:
+        ticket_id = await asyncio.to_thread(self._insert, user_id, subject, body)
+        self.start()
+        self._wakeup.set()
+        return ticket_id
+
+    def stats(self) -> dict:
+        return {
+            "tickets": self.counts(),
+            "sent": self.sent,
+            "send_errors": self.send_errors,
+            "session_open": self._smtp is not None,
+            "batch_size": self.batch_size,
+            "max_attempts": self.max_attempts
+        }
+
+    async def aclose(self):
+        # Not cancelled: the batch keeps running in its thread, so wait for it before closing the session
+        self._stopping.set()
+        if self._worker is not None:
+            self._wakeup.set()
+            await self._worker
+        await asyncio.to_thread(self._close_session)
+        with self._db_lock:
+            self._db.close()
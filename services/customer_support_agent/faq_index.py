@@ -0,0 +1,115 @@
+import threading
+import logging
+import numpy as np
+import faiss
+
+logger = logging.getLogger(__name__)
+
+
+class FaqIndex:
+    """Precomputed FAQ question embeddings with incremental add/remove.
+
+    Question embeddings are encoded once and kept as an L2-normalized NumPy
+    matrix, so matching a user question is one matrix-vector product. Once
+    the FAQ set reaches `ann_min_size` entries, searches go through a FAISS
+    HNSW index instead. HNSW can't delete vectors, so removed FAQs are
+    skipped at search time and the index is rebuilt from the matrix once
+    they exceed `rebuild_ratio` of its size.
+    """
+
+    def __init__(self, encode, ann_min_size: int = 2000, hnsw_m: int = 32,
+                 ef_search: int = 64, rebuild_ratio: float = 0.2):
+        self.encode = encode
+        self.ann_min_size = ann_min_size
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+        self.rebuild_ratio = rebuild_ratio
+        self.faqs = {}  # faq_id -> {"question", "answer"}
+        self._ids = np.empty(0, dtype=np.int64)
+        self._matrix = None
+        self._ann = None
+        self._removed_from_ann = 0
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.faqs)
+
+    def _encode(self, texts):
+        vectors = np.asarray(self.encode(texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _build_ann(self):
+        index = faiss.IndexHNSWFlat(self._matrix.shape[1], self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efSearch = self.ef_search
+        self._ann = faiss.IndexIDMap2(index)
+        self._ann.add_with_ids(self._matrix, self._ids)
+        self._removed_from_ann = 0
+        logger.info(f"Built HNSW index for {len(self._ids)} FAQs.")
+
+    def add(self, faqs: list) -> list:
+        """Add [{"question", "answer"}, ...] and return their ids."""
+        if not faqs:
+            return []
+        vectors = self._encode([f["question"] for f in faqs])
+        with self._lock:
+            ids = np.arange(self._next_id, self._next_id + len(faqs), dtype=np.int64)
+            self._next_id += len(faqs)
+            for faq_id, faq in zip(ids, faqs):
+                self.faqs[int(faq_id)] = {"question": faq["question"], "answer": faq["answer"]}
+
+            self._matrix = vectors if self._matrix is None else np.vstack([self._matrix, vectors])
+            self._ids = np.concatenate([self._ids, ids])
+
+            if self._ann is not None:
+                self._ann.add_with_ids(vectors, ids)
+            elif len(self._ids) >= self.ann_min_size:
+                self._build_ann()
+        return [int(i) for i in ids]
+
+    def remove(self, faq_ids: list) -> int:
+        """Remove FAQs by id and return how many were removed."""
+        with self._lock:
+            faq_ids = [i for i in faq_ids if i in self.faqs]
+            if not faq_ids:
+                return 0
+            for faq_id in faq_ids:
+                del self.faqs[faq_id]
+
+            keep = ~np.isin(self._ids, np.asarray(faq_ids, dtype=np.int64))
+            self._ids = self._ids[keep]
+            self._matrix = self._matrix[keep]
+
+            if self._ann is not None:
+                self._removed_from_ann += len(faq_ids)
+                if len(self._ids) < self.ann_min_size:
+                    self._ann = None
+                elif self._removed_from_ann > self.rebuild_ratio * len(self._ids):
+                    self._build_ann()
+        return len(faq_ids)
+
+    def search(self, query_embedding, threshold: float):
+        """Return (faq, score) for the closest FAQ above threshold, else (None, 0)."""
+        query = np.asarray(query_embedding, dtype=np.float32).reshape(1, -1)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        with self._lock:
+            if not self.faqs:
+                return None, 0
+            if self._ann is not None:
+                # Over-fetch so FAQs removed since the last rebuild can be skipped
+                k = min(1 + self._removed_from_ann, self._ann.ntotal)
+                scores, ids = self._ann.search(query, k)
+                best = next(((int(i), float(s)) for s, i in zip(scores[0], ids[0]) if int(i) in self.faqs), None)
+            else:
+                sims = self._matrix @ query[0]
+                idx = int(np.argmax(sims))
+                best = (int(self._ids[idx]), float(sims[idx]))
+
+            if best is None or best[1] <= threshold:
+                return None, 0
+            return self.faqs[best[0]], best[1]
+
+    def entries(self) -> list:
+        with self._lock:
+            return [{"id": faq_id, **faq} for faq_id, faq in self.faqs.items()]
@@ -1,8 +1,13 @@
+import asyncio
+from typing import Optional
 from fastapi import FastAPI
 from pydantic import BaseModel
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
 from services.customer_support_agent.customer_support_agent import SupportAgent
+from shared.utils.llm_client import close_llm_client
+from shared.utils.metrics import metrics_response
+from shared.utils.inference import shutdown_inference_executor
 from contextlib import asynccontextmanager
 
 app = FastAPI()
@@ -10,6 +15,12 @@ app = FastAPI()
 class QuestionRequest(BaseModel):
     user_id: str
     message: str
+    request_id: Optional[str] = None
+
+class PrefetchRequest(BaseModel):
+    request_id: str
+    user_id: str
+    message: str
 
 app.add_middleware(
     CORSMiddleware,
@@ -23,7 +34,13 @@ app.add_middleware(
 async def lifespan(app: FastAPI):
     agent = SupportAgent()
     app.state.agent = agent
-    yield 
+    # Deliver support emails queued before the last shutdown
+    agent.outbox.start()
+    yield
+    await close_llm_client()
+    shutdown_inference_executor()
+    agent.users.close()
+    await agent.outbox.aclose()
     
 app.state.agent = None  
 
@@ -35,8 +52,58 @@ async def handle_support_request(request: QuestionRequest):
     if not agent:
         return {"error": "Agent not initialized"}
     
-    response = agent.handle(request.user_id, request.message)
+    response = await agent.handle(request.user_id, request.message, request.request_id)
     return response
 
+@app.post("/prefetch")
+async def prefetch(request: PrefetchRequest):
+    agent = app.state.agent
+    if not agent:
+        return {"error": "Agent not initialized"}
+    agent.prefetch(request.request_id, request.message)
+    return {"status": "started"}
+
+@app.delete("/prefetch/{request_id}")
+async def cancel_prefetch(request_id: str):
+    agent = app.state.agent
+    if not agent:
+        return {"error": "Agent not initialized"}
+    return {"cancelled": agent.prefetches.cancel(request_id)}
+
+@app.get("/faqs")
+async def list_faqs():
+    agent = app.state.agent
+    if not agent:
+        return {"error": "Agent not initialized"}
+    return agent.faq_index.entries()
+
+@app.get("/users/stats")
+async def user_store_stats():
+    agent = app.state.agent
+    if not agent:
+        return {"error": "Agent not initialized"}
+    return agent.users.stats()
+
+@app.get("/tickets/{ticket_id}")
+async def ticket_status(ticket_id: str):
+    agent = app.state.agent
+    if not agent:
+        return {"error": "Agent not initialized"}
+    ticket = await asyncio.to_thread(agent.outbox.status, ticket_id)
+    if ticket is None:
+        return {"error": "Ticket not found"}
+    return ticket
+
+@app.get("/outbox/stats")
+async def outbox_stats():
+    agent = app.state.agent
+    if not agent:
+        return {"error": "Agent not initialized"}
+    return await asyncio.to_thread(agent.outbox.stats)
+
+@app.get("/metrics")
+async def metrics():
+    return metrics_response()
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000)
\ No newline at end of file
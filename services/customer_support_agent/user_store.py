@@ -0,0 +1,112 @@
+import os
+import queue
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from shared.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+USER_FIELDS = ["email", "user_name", "payment_status", "order_status"]
+
+DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_data (
+    user_id TEXT PRIMARY KEY,
+    email TEXT,
+    user_name TEXT,
+    payment_status TEXT,
+    order_status TEXT
+);
+"""
+
+# Dummy data for testing, inserted only if the users don't exist yet
+SEED_USERS = [
+    ("client789", "c789@example.com", "John Doe", "Paid", "Shipped"),
+    ("client790", "c790@example.com", "Jane Doe", "Pending", "Processing")
+]
+
+
+class UserStore:
+    """SQLite user data in WAL mode, behind a connection pool and a per-user row cache.
+
+    Lookups always read the whole row, so once a user has been looked up
+    every field is served from the cache until it expires. Nothing in the
+    service writes user rows, so edits made directly to the database show
+    up within `cache_ttl` seconds.
+    """
+
+    def __init__(self, path: str, pool_size: int = 4, cache_ttl: float = 60, cache_size: int = 10000):
+        self.path = path
+        self.rows = TTLCache(ttl=cache_ttl, max_size=cache_size)
+        self._pool = queue.LifoQueue()
+        # Every connection to ":memory:" is a separate database
+        self._pool_size = 1 if path == ":memory:" else pool_size
+        self._created = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self.connection() as conn:
+            conn.execute(DB_SCHEMA)
+            conn.executemany("INSERT OR IGNORE INTO user_data VALUES (?,?,?,?,?);", SEED_USERS)
+        logger.info(f"User store ready at {path}")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+        conn.row_factory = sqlite3.Row
+        # WAL lets readers run alongside a writer; NORMAL sync is durable enough in WAL mode
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA synchronous=NORMAL;")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection; commits on success, rolls back on error."""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self._pool_size
+                if create:
+                    self._created += 1
+            conn = self._connect() if create else self._pool.get()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._pool.put(conn)
+
+    def get_user(self, user_id: str):
+        """The user's whole row as a dict, or None if there is no such user."""
+        row = self.rows.get(user_id)
+        if row is not None:
+            return row
+        with self.connection() as conn:
+            result = conn.execute("SELECT * FROM user_data WHERE user_id=?;", (user_id,)).fetchone()
+        if result is None:
+            return None
+        row = dict(result)
+        self.rows.set(user_id, row)
+        return row
+
+    def lookup(self, user_id: str, fields: list = None):
+        """Requested known fields (all of them by default) for a user, "Not found" for missing values.
+
+        Returns None if there is no such user.
+        """
+        row = self.get_user(user_id)
+        if row is None:
+            return None
+        fields = [field for field in (fields or USER_FIELDS) if field in USER_FIELDS]
+        return {field: row.get(field) if row.get(field) is not None else "Not found" for field in fields}
+
+    def stats(self) -> dict:
+        return {"path": self.path, "pool_size": self._pool_size, "connections": self._created, "row_cache": self.rows.stats()}
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
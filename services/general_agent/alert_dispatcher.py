@@ -0,0 +1,140 @@
+import time
+import asyncio
+import logging
+from shared.utils.llm_client import create_http_client
+from shared.utils.resilience import RetryPolicy, is_connect_error
+
+logger = logging.getLogger(__name__)
+
+# Messages quoted in one digest; the rest are only counted
+DIGEST_MAX_MESSAGES = 10
+
+
+class RateLimiter:
+    """Token bucket: `rate` calls per second on average, bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class SlackAlertDispatcher:
+    """Sends suspicious-activity alerts to a Slack webhook off the request path.
+
+    submit() only records the alert. The first alert from a user opens a
+    `window`-second coalescing window; every alert from that user inside
+    the window goes out as one digest when it closes. A single worker
+    posts digests through a token-bucket rate limiter and waits out
+    Slack's Retry-After on 429. Alerts still pending at shutdown are
+    flushed.
+    """
+
+    def __init__(self, webhook_url: str, window: float = 10, rate: float = 1, burst: int = 3,
+                 timeout: float = 10, retries: int = 2, channel: str = "#alert"):
+        self.webhook_url = webhook_url
+        self.window = window
+        self.channel = channel
+        self.limiter = RateLimiter(rate, burst)
+        # A repeated webhook post would duplicate the alert, so only retry when it never got through
+        self.retry = RetryPolicy(retries, retry_on=is_connect_error)
+        self.http = create_http_client(timeout=timeout)
+        self.pending = {}  # user_id -> messages in the open window
+        self.alerts = 0
+        self.digests_sent = 0
+        self.digests_failed = 0
+        self._timers = {}
+        self._queue = None
+        self._worker = None
+
+    def submit(self, user_id: str, message: str):
+        """Record an alert; never blocks and never raises."""
+        self.alerts += 1
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+        messages = self.pending.setdefault(user_id, [])
+        messages.append(message)
+        if len(messages) == 1:
+            loop = asyncio.get_running_loop()
+            self._timers[user_id] = loop.call_later(self.window, self._close_window, user_id)
+
+    def _close_window(self, user_id):
+        self._timers.pop(user_id, None)
+        messages = self.pending.pop(user_id, None)
+        if messages:
+            self._queue.put_nowait((user_id, messages))
+
+    def _payload(self, user_id, messages):
+        if len(messages) == 1:
+            text = f"🚨 **Suspicious Activity Detected** 🚨 \n\nFrom : {user_id}\n\nMessage:{messages[0]}"
+        else:
+            quoted = "\n".join(f"• {message}" for message in messages[:DIGEST_MAX_MESSAGES])
+            more = len(messages) - DIGEST_MAX_MESSAGES
+            if more > 0:
+                quoted += f"\n…and {more} more"
+            text = (f"🚨 **Suspicious Activity Detected** 🚨 \n\nFrom : {user_id}\n\n"
+                    f"{len(messages)} messages in {self.window:g}s:\n{quoted}")
+        return {"text": text, "channel": self.channel}
+
+    async def _post(self, payload):
+        for _ in range(3):
+            await self.limiter.acquire()
+            response = await self.retry.run(lambda: self.http.post(self.webhook_url, json=payload))
+            if response.status_code != 429:
+                response.raise_for_status()
+                return
+            retry_after = response.headers.get("Retry-After", "")
+            retry_after = float(retry_after) if retry_after.isdigit() else 1.0
+            logger.warning(f"Slack rate limited the webhook, waiting {retry_after}s")
+            await asyncio.sleep(retry_after)
+        response.raise_for_status()
+
+    async def _run(self):
+        while True:
+            user_id, messages = await self._queue.get()
+            try:
+                if not self.webhook_url:
+                    raise ValueError("SLACK_WEBHOOK_URL is not set")
+                await self._post(self._payload(user_id, messages))
+                self.digests_sent += 1
+                logger.info(f"Slack alert sent for {user_id} ({len(messages)} messages).")
+            except Exception as e:
+                self.digests_failed += 1
+                logger.error(f"Error sending Slack notification for {user_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            "alerts": self.alerts,
+            "digests_sent": self.digests_sent,
+            "digests_failed": self.digests_failed,
+            "open_windows": len(self.pending),
+            "queued_digests": self._queue.qsize() if self._queue else 0,
+            "window_s": self.window,
+            "rate_per_s": self.limiter.rate
+        }
+
+    async def aclose(self, timeout: float = 5):
+        for user_id in list(self._timers):
+            self._timers[user_id].cancel()
+            self._close_window(user_id)
+        if self._worker is not None:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Dropping {self._queue.qsize()} Slack alerts at shutdown")
+            self._worker.cancel()
+        await self.http.aclose()
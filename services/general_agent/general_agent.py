@@ -1,116 +1,144 @@
 import os
 import json
-import requests
+import httpx
 import logging
 from dotenv import load_dotenv
 
-from shared.utils.load_prompt import load_prompt_template
+from shared.utils.load_prompt import load_prompt_template, fuse_personality
 from shared.utils.tools import send_slack_notification, get_news
+from shared.utils.llm_client import get_llm_client
+from shared.utils.metrics import track_stage
+from shared.utils.resilience import RetryPolicy
+from shared.utils.tool_calls import run_tool_calls, TOOL_TIMEOUT
+from shared.utils.swr_cache import StaleWhileRevalidateCache
+from services.general_agent.alert_dispatcher import SlackAlertDispatcher
 load_dotenv()
 
-API_ENDPOINT = os.getenv("API_ENDPOINT")
-API_KEY = os.getenv("API_KEY")
 SLACK_WEBHOOK_URL = os.getenv("SLACK_WEBHOOK_URL")
-
-HEADERS = {
-    "Content-Type": "application/json",
-    "api-key": API_KEY
-}
+NEWS_API_URL = os.getenv("NEWS_API_URL", "https://newsdata.io/api/1/latest")
+NEWS_API_KEY = os.getenv("NEWS_API_KEY", "pub_2d18ef10b18a49d198e4bb200a7b3e0e")
+# Tool calls get a bounded timeout and retries instead of hanging the request
+TOOL_HTTP_TIMEOUT = float(os.getenv("TOOL_HTTP_TIMEOUT", "10"))
+TOOL_HTTP_RETRIES = int(os.getenv("TOOL_HTTP_RETRIES", "2"))
+
+news_retry = RetryPolicy(TOOL_HTTP_RETRIES)
+# Every news attempt and the backoff between them must fit in TOOL_TIMEOUT, or the later retries never reach the caller
+NEWS_ATTEMPT_TIMEOUT = min(
+    TOOL_HTTP_TIMEOUT,
+    max(1.0, (TOOL_TIMEOUT - TOOL_HTTP_RETRIES * news_retry.max_delay) / (TOOL_HTTP_RETRIES + 1))
+)
+
+# News per topic is fresh for NEWS_CACHE_TTL seconds, then served stale for up to
+# NEWS_CACHE_STALE_TTL more while a single background request refreshes it
+NEWS_CACHE_TTL = float(os.getenv("NEWS_CACHE_TTL", "60"))
+NEWS_CACHE_STALE_TTL = float(os.getenv("NEWS_CACHE_STALE_TTL", "600"))
+NEWS_CACHE_SIZE = int(os.getenv("NEWS_CACHE_SIZE", "256"))
+
+news_cache = StaleWhileRevalidateCache(NEWS_CACHE_TTL, NEWS_CACHE_STALE_TTL, NEWS_CACHE_SIZE)
+
+# Slack alerts are sent in the background, one digest per user per window, within Slack's rate limit
+SLACK_ALERT_WINDOW = float(os.getenv("SLACK_ALERT_WINDOW", "10"))
+SLACK_RATE_LIMIT = float(os.getenv("SLACK_RATE_LIMIT", "1"))
+SLACK_RATE_BURST = int(os.getenv("SLACK_RATE_BURST", "3"))
+
+# Style LLM answers in the same generation instead of a separate PersonalityLayer call
+GENERAL_FUSED_PERSONALITY = os.getenv("GENERAL_FUSED_PERSONALITY", "false").lower() == "true"
 
 TOOLS = [send_slack_notification, get_news]
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Get news tool function to fetch latest news articles based on a topic
-def get_news_tool(topic: str) -> str:
-    try:
-        logger.info(f"Fetching news for topic: {topic}")
-        url = f"https://newsdata.io/api/1/latest?apikey=pub_2d18ef10b18a49d198e4bb200a7b3e0e&q={topic}"
-        
-        response = requests.get(url)
+# Fetch the latest news titles for a topic from the news API, raising on failure
+async def fetch_news(topic: str) -> str:
+    logger.info(f"Fetching news for topic: {topic}")
+    async def fetch():
+        async with httpx.AsyncClient(timeout=NEWS_ATTEMPT_TIMEOUT) as client:
+            response = await client.get(NEWS_API_URL, params={"apikey": NEWS_API_KEY, "q": topic})
         response.raise_for_status()
+        return response
 
-        data = response.json()
+    response = await news_retry.run(fetch)
 
-        results = data.get("results", [])
+    data = response.json()
 
-        top_articles = results[:10]
+    results = data.get("results", [])
 
-        titles = [
-        f"{i+1}. {article['title']}"
-        for i, article in enumerate(top_articles)
-        if "title" in article
-        ]
+    top_articles = results[:10]
 
-        logger.info("News Fetched")
-        return {"tool_name":"get_news_tool","Response":"\n".join(titles)}
+    titles = [
+    f"{i+1}. {article['title']}"
+    for i, article in enumerate(top_articles)
+    if "title" in article
+    ]
+
+    logger.info("News Fetched")
+    return "\n".join(titles)
+
+# Get news tool function to fetch latest news articles based on a topic
+async def get_news_tool(topic: str) -> str:
+    try:
+        # Headlines barely change within a minute, so serve them from the cache
+        titles = await news_cache.get(" ".join(topic.lower().split()), lambda: fetch_news(topic))
+        return {"tool_name":"get_news_tool","Response":titles}
 
     except Exception as e:
         logger.error(f"Error retrieving news: {e}")
         return f"Error retrieving news: {e}"
 
-# Function to send a Slack notification when suspicious activity is detected    
-def send_slack_notification_tool(user_id:str, message: str):
-    logger.info(f"Sending Slack notification for suspicious activity detected by {user_id}")    
-    payload = {
-        "text": f"🚨 **Suspicious Activity Detected** 🚨 \n\nFrom : {user_id}\n\nMessage:{message}",
-        "channel": "#alert"  # Slack channel name
-    }
-        
-    try:
-        response = requests.post(SLACK_WEBHOOK_URL, json=payload)
-        response.raise_for_status()
-        logger.info("Slack notification sent successfully.")
-        return {"tool_name": "slack_notification", "Response": "Found suspecious activity. Slack notification sent to our team successfully."}
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error sending Slack notification: {e}")
+# Function to alert the team on Slack when suspicious activity is detected
+async def send_slack_notification_tool(alerts: SlackAlertDispatcher, user_id:str, message: str):
+    logger.info(f"Queueing Slack notification for suspicious activity detected by {user_id}")
+    # Delivery happens in the background, the user's response doesn't wait for Slack
+    alerts.submit(user_id, message)
+    return {"tool_name": "slack_notification", "Response": "Found suspecious activity. Slack notification sent to our team successfully."}
 
 
 class GeneralAgent:
     def __init__(self):
         self.prompt_template_path = "shared/prompts/general_agent_prompt.txt"
-
-    def handle(self, user_id: str, question: str) -> str:
+        self.llm = get_llm_client()
+        self.alerts = SlackAlertDispatcher(
+            SLACK_WEBHOOK_URL,
+            window=SLACK_ALERT_WINDOW,
+            rate=SLACK_RATE_LIMIT,
+            burst=SLACK_RATE_BURST,
+            timeout=TOOL_HTTP_TIMEOUT,
+            retries=TOOL_HTTP_RETRIES
+        )
+
+    async def _run_tool(self, function_name, function_args):
+        if function_name == "send_slack_notification_tool":
+            return await send_slack_notification_tool(self.alerts, function_args['user_id'],function_args['message'])
+        if function_name == "get_news_tool":
+            return await get_news_tool(function_args['topic'])
+        return "Unknown tool called"
+
+    async def handle(self, user_id: str, question: str) -> str:
 
         system_prompt = load_prompt_template(self.prompt_template_path)
+        if GENERAL_FUSED_PERSONALITY:
+            system_prompt = fuse_personality(system_prompt)
 
-        payload = {
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Question: {question} User ID: {user_id}"} 
-            ],
-            "tools" : TOOLS,
-            "tool_choice" : "auto"
-        }
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": f"Question: {question} User ID: {user_id}"} 
+        ]
 
         try:
-            resp = requests.post(
-                API_ENDPOINT,
-                headers=HEADERS,
-                json=payload
-            )
-            resp.raise_for_status()
-            response_data = resp.json()
-            
-            message = response_data["choices"][0]["message"]
+            with track_stage("agent_llm"):
+                message = await self.llm.chat_message(messages, tools=TOOLS)
             if message.get("tool_calls"):
-                tool_call = message["tool_calls"][0] 
-                function_name = tool_call["function"]["name"]
-                function_args = json.loads(tool_call["function"]["arguments"])
-                logger.info(f"Executing tool : {function_name}")
-                if function_name == "send_slack_notification_tool":
-                    return send_slack_notification_tool(function_args['user_id'],function_args['message'])
-                if function_name == "get_news_tool":
-                    return get_news_tool(function_args['topic'])
+                # e.g. a fraud report plus a news question: alert and fetch news at the same time
+                return await run_tool_calls(message["tool_calls"], self._run_tool)
             elif message.get("content"):
                 logger.info("Received response from LLM")
-                return {"tool_name":"llm_response","Response": message["content"]}
+                return {"tool_name":"llm_response","Response": message["content"],"personality_applied": GENERAL_FUSED_PERSONALITY}
             else:
                 logger.warning("No content found in the response from LLM.")
                 return {"tool_name":"Error","Response":"No content found in the response."}
             
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Request error: {e}")
             return "Sorry, there was an error processing your request."
         except json.JSONDecodeError as e:
@@ -2,7 +2,9 @@ from fastapi import FastAPI
 from pydantic import BaseModel
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
-from services.general_agent.general_agent import GeneralAgent
+from services.general_agent.general_agent import GeneralAgent, news_cache
+from shared.utils.llm_client import close_llm_client
+from shared.utils.metrics import metrics_response
 from contextlib import asynccontextmanager
 
 app = FastAPI()
@@ -24,7 +26,9 @@ app.add_middleware(
 async def lifespan(app: FastAPI):
     agent = GeneralAgent()
     app.state.agent = agent
-    yield 
+    yield
+    await agent.alerts.aclose()
+    await close_llm_client()
     
 app.state.agent = None  
 
@@ -36,8 +40,23 @@ async def handle_support_request(request: QuestionRequest):
     if not agent:
         return {"error": "Agent not initialized"}
     
-    response = agent.handle(request.user_id, request.message)
+    response = await agent.handle(request.user_id, request.message)
     return response
 
+@app.get("/alerts/stats")
+async def alert_stats():
+    agent = app.state.agent
+    if not agent:
+        return {"error": "Agent not initialized"}
+    return agent.alerts.stats()
+
+@app.get("/news_cache/stats")
+async def news_cache_stats():
+    return news_cache.stats()
+
+@app.get("/metrics")
+async def metrics():
+    return metrics_response()
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000)
\ No newline at end of file
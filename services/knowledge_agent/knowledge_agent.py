@@ -1,28 +1,83 @@
+import time
+_import_started = time.perf_counter()
+
 import os
+import asyncio
+import threading
+import httpx
 import requests
+import faiss
+import numpy as np
 from duckduckgo_search import DDGS
-from bs4 import BeautifulSoup
 from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFacePipeline, HuggingFaceEmbeddings
-from transformers import pipeline
-import json
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+from langchain_huggingface import HuggingFacePipeline
 from dotenv import load_dotenv
 import logging
 
-from shared.utils.load_prompt import load_prompt_template
+from shared.utils.load_prompt import format_prompt, fuse_personality
 from shared.utils.tools import duckduckgo_tool
+from shared.utils.llm_client import get_llm_client
+from shared.utils.prefetch import PrefetchStore
+from shared.utils.ttl_cache import TTLCache
+from shared.utils.micro_batcher import MicroBatcher
+from shared.utils.inference import get_inference_executor
+from shared.utils.embedding_backend import create_embedding_backend
+from shared.utils.metrics import track_stage
+from shared.utils.tool_calls import run_tool_calls
+from services.knowledge_agent.snapshot import compute_content_hash, load_snapshot, save_snapshot, set_current_hash, prune_snapshots
+from services.knowledge_agent.scraper import PageScraper
+
+IMPORT_SECONDS = time.perf_counter() - _import_started
 
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-API_ENDPOINT = os.getenv("API_ENDPOINT")
 API_KEY = os.getenv("API_KEY")
 
+EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+GENERATOR_MODEL = "pierreguillou/gpt2-small-portuguese"
+# "torch" or "onnx" (int8-quantized ONNX Runtime)
+KNOWLEDGE_EMBEDDING_BACKEND = os.getenv("KNOWLEDGE_EMBEDDING_BACKEND", "torch")
+
+# Answers come from the remote LLM API, so the local generator is only loaded on demand
+KNOWLEDGE_LOAD_GENERATOR = os.getenv("KNOWLEDGE_LOAD_GENERATOR", "false").lower() == "true"
+
+# On-disk knowledge base snapshots (share this directory between replicas)
+KNOWLEDGE_SNAPSHOT_DIR = os.getenv("KNOWLEDGE_SNAPSHOT_DIR", "data/knowledge_snapshots")
+KNOWLEDGE_REFRESH_ON_START = os.getenv("KNOWLEDGE_REFRESH_ON_START", "true").lower() == "true"
+
+# Optional search endpoint used instead of DuckDuckGo (e.g. the benchmark stub), GET ?q= returning [{"body": ...}]
+SEARCH_API_URL = os.getenv("SEARCH_API_URL")
+
+# Scraping stage
+KNOWLEDGE_SCRAPE_CONCURRENCY = int(os.getenv("KNOWLEDGE_SCRAPE_CONCURRENCY", "6"))
+KNOWLEDGE_SCRAPE_TIMEOUT = float(os.getenv("KNOWLEDGE_SCRAPE_TIMEOUT", "10"))
+
+# Style RAG answers in the same generation instead of a separate PersonalityLayer call
+KNOWLEDGE_FUSED_PERSONALITY = os.getenv("KNOWLEDGE_FUSED_PERSONALITY", "false").lower() == "true"
+
+# Concurrent queries are embedded and searched together
+KNOWLEDGE_BATCH_MAX_SIZE = int(os.getenv("KNOWLEDGE_BATCH_MAX_SIZE", "16"))
+KNOWLEDGE_BATCH_WINDOW_MS = float(os.getenv("KNOWLEDGE_BATCH_WINDOW_MS", "5"))
+
+# Answer cache for RAG responses
+KNOWLEDGE_ANSWER_CACHE_ENABLED = os.getenv("KNOWLEDGE_ANSWER_CACHE_ENABLED", "true").lower() == "true"
+KNOWLEDGE_ANSWER_CACHE_TTL = float(os.getenv("KNOWLEDGE_ANSWER_CACHE_TTL", "600"))
+KNOWLEDGE_ANSWER_CACHE_SIZE = int(os.getenv("KNOWLEDGE_ANSWER_CACHE_SIZE", "1000"))
+
 # Tool Function for DuckDuckGo Search
 def duckduckgo_search_tool(query: str) -> str:
     try:
+        if SEARCH_API_URL:
+            response = requests.get(SEARCH_API_URL, params={"q": query}, timeout=10)
+            response.raise_for_status()
+            results = response.json()[:3]
+            logger.info("Got results from search API.")
+            return {"tool_name":"duckduckgo_search_tool","Response":"\n".join(r['body'] for r in results)}
         with DDGS() as ddgs:
             results = list(ddgs.text(query, max_results=3))
             logger.info("Got results from DuckDuckGo search.")
@@ -32,25 +87,38 @@ def duckduckgo_search_tool(query: str) -> str:
 
 TOOLS = [duckduckgo_tool]
 
+def normalize_question(message: str) -> str:
+    return " ".join(message.lower().split()).rstrip("?!. ")
+
 class KnowledgeAgent:
     def __init__(self):
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
-            model_kwargs={'device': 'cpu'}
-        )
-        text_generation_pipeline = pipeline(
-            "text-generation", 
-            model="pierreguillou/gpt2-small-portuguese",
-            max_new_tokens=150,
-            temperature=0.7,
-            do_sample=True,
-            return_full_text=False,
-            pad_token_id=50256,
-            truncation=True
-        )
+        started = time.perf_counter()
+        self.startup_report = {"import_ms": round(IMPORT_SECONDS * 1000, 1)}
+        self.embeddings = create_embedding_backend(EMBEDDING_MODEL, KNOWLEDGE_EMBEDDING_BACKEND)
+        self.startup_report["embedding_model_load_ms"] = round((time.perf_counter() - started) * 1000, 1)
 
-        self.generator = HuggingFacePipeline(pipeline=text_generation_pipeline)
+        self._generator = None
+        self._generator_lock = threading.Lock()
+        self.startup_report["generator_load_ms"] = None
+        if KNOWLEDGE_LOAD_GENERATOR:
+            self._load_generator()
         self.vectorstore = None
+        self.snapshot_hash = None
+        # (vectorstore, snapshot_hash) swapped in one assignment, so searches see a consistent pair
+        self._search_index = (None, None)
+        self.chunks = []
+        self.page_state = {}
+        self.scrape_report = None
+        self.scraper = PageScraper(concurrency=KNOWLEDGE_SCRAPE_CONCURRENCY, timeout=KNOWLEDGE_SCRAPE_TIMEOUT)
+        self.prefetches = PrefetchStore()
+        self.search_batcher = MicroBatcher(
+            self._search_batch,
+            max_batch_size=KNOWLEDGE_BATCH_MAX_SIZE,
+            max_wait_ms=KNOWLEDGE_BATCH_WINDOW_MS,
+            executor=get_inference_executor(),
+            name="knowledge_search"
+        )
+        self.answer_cache = TTLCache(ttl=KNOWLEDGE_ANSWER_CACHE_TTL, max_size=KNOWLEDGE_ANSWER_CACHE_SIZE)
         self.pages = [
             "https://www.infinitepay.io",
             "https://www.infinitepay.io/maquininha",
@@ -72,94 +140,274 @@ class KnowledgeAgent:
             "https://www.infinitepay.io/rendimento"
         ]
         self.prompt_template_path = "shared/prompts/knowledge_agent_prompt.txt"
+        self.llm = get_llm_client()
+
+        index_started = time.perf_counter()
         self._build_knowledge_base()
+        self.startup_report["index_build_ms"] = round((time.perf_counter() - index_started) * 1000, 1)
+        self.startup_report["index_source"] = self.index_source
+        self.startup_report["total_ms"] = round((time.perf_counter() - started) * 1000 + self.startup_report["import_ms"], 1)
+        logger.info(f"KnowledgeAgent startup: {self.startup_report}")
 
-    def _scrape(self, url):
-        try:
-            headers = {'User-Agent': 'Mozilla/5.0'}
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, "html.parser")
-            for script in soup(["script", "style"]):
-                script.decompose()
-            texts = soup.find_all(['p', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'div'])
-            return "\n".join(t.get_text().strip() for t in texts if len(t.get_text().strip()) > 10)
-        except Exception as e:
-            logger.error(f"Scrape error for {url}: {e}")
-            return ""
+    # Local text-generation pipeline, loaded on first access
+    @property
+    def generator(self):
+        return self._load_generator()
+
+    def _load_generator(self):
+        with self._generator_lock:
+            if self._generator is None:
+                started = time.perf_counter()
+                from transformers import pipeline
+                text_generation_pipeline = pipeline(
+                    "text-generation", 
+                    model=GENERATOR_MODEL,
+                    max_new_tokens=150,
+                    temperature=0.7,
+                    do_sample=True,
+                    return_full_text=False,
+                    pad_token_id=50256,
+                    truncation=True
+                )
+                self._generator = HuggingFacePipeline(pipeline=text_generation_pipeline)
+                self.startup_report["generator_load_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                logger.info(f"Loaded {GENERATOR_MODEL} in {self.startup_report['generator_load_ms']:.0f} ms")
+            return self._generator
 
     def _chunk_text(self, text, chunk_size=500):
         words = text.split()
         return [" ".join(words[i:i + chunk_size]) for i in range(0, len(words), chunk_size)]
 
-    # Build the knowledge base by scraping the pages and chunking the text
+    # Load the knowledge base from the latest snapshot, or build it if there is none
     def _build_knowledge_base(self):
-        chunks = []
+        snapshot = load_snapshot(KNOWLEDGE_SNAPSHOT_DIR)
+        if snapshot and self._snapshot_matches(snapshot[2]):
+            self.index_source = "snapshot"
+            self._use_snapshot(*snapshot)
+            if KNOWLEDGE_REFRESH_ON_START:
+                # Serve from the snapshot right away, re-embed only if the pages changed
+                threading.Thread(target=self.refresh_knowledge_base, daemon=True).start()
+            return
+        self.index_source = "scrape"
+        self.refresh_knowledge_base()
+
+    def _snapshot_matches(self, manifest):
+        return manifest.get("embedding_model") == self.embeddings.identifier and manifest.get("pages") == self.pages
+
+    def _use_index(self, index, chunks, content_hash, page_state):
+        docstore = InMemoryDocstore({
+            str(i): Document(id=str(i), page_content=c["content"], metadata={"source": c["source"]})
+            for i, c in enumerate(chunks)
+        })
+        self.vectorstore = FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id={i: str(i) for i in range(len(chunks))}
+        )
+        self._search_index = (self.vectorstore, content_hash)
+        self.chunks = chunks
+        if content_hash != self.snapshot_hash:
+            # Cached answers were generated from the previous snapshot's chunks
+            self.answer_cache.clear()
+        self.snapshot_hash = content_hash
+        self.page_state = page_state
+
+    def _use_snapshot(self, index, chunks, manifest):
+        self._use_index(index, chunks, manifest["content_hash"], manifest.get("page_state", {}))
+        logger.info(f"Loaded knowledge base snapshot {self.snapshot_hash[:12]} ({len(chunks)} chunks).")
+
+    # Scrape the pages concurrently; unchanged pages (304) reuse their previous chunks
+    def _scrape_chunks(self):
         logger.info("Building knowledge base from scraped pages...")
-        for page in self.pages:
-            content = self._scrape(page)
-            if content:
-                for chunk in self._chunk_text(content):
-                    chunks.append({"content": chunk, "source": page})
-                logger.info(f"Scraped {len(chunks)} chunks from {page}")
-            
-        texts = [c["content"] for c in chunks]
-        metadatas = [{"source": c["source"]} for c in chunks]
-        if texts:
-            self.vectorstore = FAISS.from_texts(texts=texts, embedding=self.embeddings, metadatas=metadatas)
-            logger.info("Knowledge base successfully built.")
+        started = time.perf_counter()
+        results = self.scraper.scrape_all(self.pages, self.page_state)
+
+        chunks, page_state, report = [], {}, []
+        for result in results:
+            page = result["url"]
+            if result["status"] == "modified":
+                page_chunks = [{"content": chunk, "source": page} for chunk in self._chunk_text(result["text"])]
+            else:
+                # Not modified, or a transient error: keep what the current index has
+                page_chunks = [c for c in self.chunks if c["source"] == page]
+            chunks.extend(page_chunks)
+            if result["etag"] or result["last_modified"]:
+                page_state[page] = {"etag": result["etag"], "last_modified": result["last_modified"]}
+            report.append({
+                "url": page,
+                "status": result["status"],
+                "http_status": result["http_status"],
+                "elapsed_ms": round(result["elapsed"] * 1000, 1),
+                "chunks": len(page_chunks)
+            })
+            logger.info(f"Scraped {page}: {result['status']} in {result['elapsed'] * 1000:.0f} ms, {len(page_chunks)} chunks")
+
+        self.scrape_report = {
+            "total_ms": round((time.perf_counter() - started) * 1000, 1),
+            "concurrency": self.scraper.concurrency,
+            "pages": report
+        }
+        logger.info(f"Scraped {len(self.pages)} pages in {self.scrape_report['total_ms']:.0f} ms")
+        return chunks, page_state
+
+    # Embed only chunks that are not already in the current index
+    def _embed_chunks(self, chunks):
+        previous_rows = {(c["source"], c["content"]): i for i, c in enumerate(self.chunks)}
+        vectors = [None] * len(chunks)
+        missing = []
+        for i, c in enumerate(chunks):
+            row = previous_rows.get((c["source"], c["content"]))
+            if row is not None:
+                vectors[i] = self.vectorstore.index.reconstruct(row)
+            else:
+                missing.append(i)
+
+        if missing:
+            embedded = self.embeddings.embed_documents([chunks[i]["content"] for i in missing])
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+        logger.info(f"Embedded {len(missing)} new chunks, reused {len(chunks) - len(missing)}.")
+        return np.asarray(vectors, dtype=np.float32)
+
+    # Re-scrape the pages and rebuild the index only when their content changed
+    def refresh_knowledge_base(self):
+        chunks, page_state = self._scrape_chunks()
+        if not chunks:
+            logger.warning("No content scraped, keeping the current knowledge base.")
+            return
+
+        content_hash = compute_content_hash(chunks, self.embeddings.identifier)
+        if content_hash == self.snapshot_hash:
+            self.page_state = page_state
+            logger.info("Knowledge base content unchanged, skipping rebuild.")
+            return
+
+        # Another replica may already have built this exact content
+        snapshot = load_snapshot(KNOWLEDGE_SNAPSHOT_DIR, content_hash)
+        if snapshot is not None:
+            set_current_hash(KNOWLEDGE_SNAPSHOT_DIR, content_hash)
+            self._use_snapshot(*snapshot)
+            prune_snapshots(KNOWLEDGE_SNAPSHOT_DIR)
+            return
+
+        vectors = self._embed_chunks(chunks)
+        index = faiss.IndexFlatL2(vectors.shape[1])
+        index.add(vectors)
+        logger.info("Knowledge base successfully built.")
+        try:
+            save_snapshot(KNOWLEDGE_SNAPSHOT_DIR, content_hash, index, chunks, {
+                "embedding_model": self.embeddings.identifier,
+                "pages": self.pages,
+                "page_state": page_state
+            })
+            snapshot = load_snapshot(KNOWLEDGE_SNAPSHOT_DIR, content_hash)
+        except OSError as e:
+            logger.error(f"Failed to save knowledge base snapshot: {e}")
+
+        if snapshot is not None:
+            self._use_snapshot(*snapshot)
+            # Keep the new snapshot and the one before it
+            prune_snapshots(KNOWLEDGE_SNAPSHOT_DIR)
+        else:
+            # Serve the in-memory index when the snapshot can't be written or read back
+            self._use_index(index, chunks, content_hash, page_state)
 
     # Generate a response using the GPT-4 API
-    def generate_with_gpt4_api(self, messages, tools=None):
+    async def generate_with_gpt4_api(self, messages, tools=None):
         headers = {
             'Content-Type': 'application/json',
             'Authorization': f'Bearer {API_KEY}'
         }
-        payload = {
-            "model": "gpt-4o-chatgmp",
-            "messages": messages,
-            "temperature": 0.7,
-            "max_tokens": 150
-        }
-        if tools:
-            payload["tools"] = tools
-            payload["tool_choice"] = "auto"
+        try:
+            with track_stage("agent_llm"):
+                return await self.llm.chat(
+                    messages,
+                    tools=tools,
+                    headers=headers,
+                    model="gpt-4o-chatgmp",
+                    temperature=0.7,
+                    max_tokens=150
+                )
+        except httpx.HTTPStatusError as e:
+            return {"error": e.response.text}
+        except httpx.HTTPError as e:
+            # Timeouts, connection errors and CircuitOpenError
+            return {"error": str(e) or type(e).__name__}
+
+    # One forward pass and one FAISS search for every query in the batch.
+    # Each result is (snapshot_hash, docs) for the snapshot the docs actually came from
+    def _search_batch(self, queries, k=3):
+        vectorstore, snapshot_hash = self._search_index
+        vectors = np.asarray(self.embeddings.embed_documents(queries), dtype=np.float32)
+        _, rows = vectorstore.index.search(vectors, k)
+        return [
+            (snapshot_hash, [vectorstore.docstore.search(vectorstore.index_to_docstore_id[int(i)]) for i in query_rows if i != -1])
+            for query_rows in rows
+        ]
+
+    async def _retrieve(self, message):
+        with track_stage("retrieval"):
+            return await self.search_batcher.submit(message)
 
-        res = requests.post(API_ENDPOINT, headers=headers, data=json.dumps(payload))
-        if res.status_code == 200:
-            return res.json()
-        return {"error": res.text}
+    # Start the similarity search speculatively while the router is still classifying
+    def prefetch(self, request_id: str, message: str):
+        if self.vectorstore:
+            self.prefetches.start(request_id, self._retrieve(message))
+
+    async def _run_tool(self, function_name, function_args):
+        if function_name == "duckduckgo_search_tool":
+            logger.info("Calling DuckDuckGo search tool.")
+            return await asyncio.to_thread(duckduckgo_search_tool, function_args['query'])
+        return "Unknown tool called"
 
     # Handle the user's message by searching the knowledge base and generating a response
-    def handle(self, user_id:str, message:str):
+    async def handle(self, user_id:str, message:str, request_id:str = None):
         if not self.vectorstore:
             logger.warning("Knowledge base is not initialized.")
             return "Knowledge base is not initialized."
         
-        logger.info(f"Searching knowledge base for message: {message}")
-        docs = self.vectorstore.similarity_search(message, k=3)
+        retrieved = await self.prefetches.take(request_id) if request_id else None
+        if retrieved is None:
+            logger.info(f"Searching knowledge base for message: {message}")
+            retrieved = await self._retrieve(message)
+        else:
+            logger.info("Using prefetched knowledge base results.")
+        snapshot_hash, docs = retrieved
 
         if docs:
+            # Same question over the same chunks of the same snapshot gets the same answer
+            cache_key = (snapshot_hash, normalize_question(message), tuple(doc.id for doc in docs))
+            if KNOWLEDGE_ANSWER_CACHE_ENABLED:
+                cached = self.answer_cache.get(cache_key)
+                if cached is not None:
+                    logger.info("Answer cache hit.")
+                    return {"tool_name": "RAG (cached)", "Response": cached, "personality_applied": KNOWLEDGE_FUSED_PERSONALITY}
+
             context = "\n\n".join(doc.page_content for doc in docs)
-            prompt = load_prompt_template(self.prompt_template_path)
-            final_prompt = prompt.format(context=context)
+            final_prompt = format_prompt(self.prompt_template_path, context=context)
+            if KNOWLEDGE_FUSED_PERSONALITY:
+                final_prompt = fuse_personality(final_prompt)
             messages = [
                 {"role": "system", "content": final_prompt},
                 {"role": "user", "content": f"QUESTION: {message}"}
             ]
-            result = self.generate_with_gpt4_api(messages,TOOLS)
+            result = await self.generate_with_gpt4_api(messages,TOOLS)
+            if "error" in result:
+                logger.error(f"Request error: {result['error']}")
+                return "Sorry, there was an error processing your request."
 
             message = result["choices"][0]["message"]
             if message.get("tool_calls"):
-                tool_call = message["tool_calls"][0] 
-                function_name = tool_call["function"]["name"]
-                function_args = json.loads(tool_call["function"]["arguments"])
-                if function_name == "duckduckgo_search_tool":
-                    logger.info("Calling DuckDuckGo search tool.")
-                    return duckduckgo_search_tool(function_args['query'])
-            
-            return {"tool_name":"RAG","Response":message.get('content', 'No response')}
+                # One search per tool call, all running at the same time
+                return await run_tool_calls(message["tool_calls"], self._run_tool)
+
+            answer = message.get('content', 'No response')
+            if KNOWLEDGE_ANSWER_CACHE_ENABLED and message.get('content'):
+                self.answer_cache.set(cache_key, answer)
+            return {"tool_name":"RAG","Response":answer,"personality_applied":KNOWLEDGE_FUSED_PERSONALITY}
 
         else:
             logger.info("Calling DuckDuckGo search tool.")
-            return duckduckgo_search_tool(message)
+            with track_stage("tool:duckduckgo_search_tool"):
+                return await asyncio.to_thread(duckduckgo_search_tool, message)
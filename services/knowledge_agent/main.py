@@ -1,8 +1,12 @@
+from typing import Optional
 from fastapi import FastAPI
 from pydantic import BaseModel
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
 from services.knowledge_agent.knowledge_agent import KnowledgeAgent
+from shared.utils.llm_client import close_llm_client
+from shared.utils.metrics import metrics_response
+from shared.utils.inference import shutdown_inference_executor
 from contextlib import asynccontextmanager
 
 app = FastAPI()
@@ -10,6 +14,12 @@ app = FastAPI()
 class QuestionRequest(BaseModel):
     user_id: str
     message: str
+    request_id: Optional[str] = None
+
+class PrefetchRequest(BaseModel):
+    request_id: str
+    user_id: str
+    message: str
 
 # CORS middleware
 app.add_middleware(
@@ -24,7 +34,10 @@ app.add_middleware(
 async def lifespan(app: FastAPI):
     agent = KnowledgeAgent()
     app.state.agent = agent
-    yield 
+    yield
+    await agent.search_batcher.aclose()
+    await close_llm_client()
+    shutdown_inference_executor()
     
 app.state.agent = None  
 
@@ -36,8 +49,55 @@ async def handle_support_request(request: QuestionRequest):
     if not agent:
         return {"error": "Agent not initialized"}
     
-    response = agent.handle(request.user_id, request.message)
+    response = await agent.handle(request.user_id, request.message, request.request_id)
     return response
 
+@app.post("/prefetch")
+async def prefetch(request: PrefetchRequest):
+    agent = app.state.agent
+    if not agent:
+        return {"error": "Agent not initialized"}
+    agent.prefetch(request.request_id, request.message)
+    return {"status": "started"}
+
+@app.delete("/prefetch/{request_id}")
+async def cancel_prefetch(request_id: str):
+    agent = app.state.agent
+    if not agent:
+        return {"error": "Agent not initialized"}
+    return {"cancelled": agent.prefetches.cancel(request_id)}
+
+@app.get("/knowledge_base/scrape_report")
+async def scrape_report():
+    agent = app.state.agent
+    if not agent:
+        return {"error": "Agent not initialized"}
+    return {"snapshot": agent.snapshot_hash, "report": agent.scrape_report}
+
+@app.get("/startup_report")
+async def startup_report():
+    agent = app.state.agent
+    if not agent:
+        return {"error": "Agent not initialized"}
+    return agent.startup_report
+
+@app.get("/knowledge_base/batcher/stats")
+async def batcher_stats():
+    agent = app.state.agent
+    if not agent:
+        return {"error": "Agent not initialized"}
+    return agent.search_batcher.stats()
+
+@app.get("/knowledge_base/answer_cache/stats")
+async def answer_cache_stats():
+    agent = app.state.agent
+    if not agent:
+        return {"error": "Agent not initialized"}
+    return {"snapshot": agent.snapshot_hash, **agent.answer_cache.stats()}
+
+@app.get("/metrics")
+async def metrics():
+    return metrics_response()
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,80 @@
+import time
+import logging
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+
+def extract_text(html: str) -> str:
+    soup = BeautifulSoup(html, "html.parser")
+    for script in soup(["script", "style"]):
+        script.decompose()
+    texts = soup.find_all(['p', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'div'])
+    return "\n".join(t.get_text().strip() for t in texts if len(t.get_text().strip()) > 10)
+
+
+class PageScraper:
+    """Fetches pages concurrently over a shared keep-alive session.
+
+    Each page is requested with the ETag / Last-Modified validators from
+    the previous build, so unchanged pages come back as 304 and are neither
+    downloaded nor parsed again.
+    """
+
+    def __init__(self, concurrency: int = 6, timeout: float = 10):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({'User-Agent': 'Mozilla/5.0'})
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def fetch(self, url: str, validators: dict = None) -> dict:
+        """Return {"url", "status", "http_status", "text", "etag", "last_modified", "elapsed"}.
+
+        status is "modified", "not_modified" or "error".
+        """
+        validators = validators or {}
+        headers = {}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+        result = {
+            "url": url,
+            "status": "error",
+            "http_status": None,
+            "text": "",
+            "etag": validators.get("etag"),
+            "last_modified": validators.get("last_modified"),
+        }
+        started = time.perf_counter()
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            result["http_status"] = response.status_code
+            if response.status_code == 304:
+                result["status"] = "not_modified"
+            else:
+                response.raise_for_status()
+                result["text"] = extract_text(response.text)
+                result["etag"] = response.headers.get("ETag")
+                result["last_modified"] = response.headers.get("Last-Modified")
+                result["status"] = "modified"
+        except Exception as e:
+            logger.error(f"Scrape error for {url}: {e}")
+        result["elapsed"] = time.perf_counter() - started
+        return result
+
+    def scrape_all(self, pages: list, page_validators: dict = None) -> list:
+        """Fetch every page with at most `concurrency` requests in flight, in page order."""
+        page_validators = page_validators or {}
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            return list(pool.map(lambda url: self.fetch(url, page_validators.get(url)), pages))
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,143 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+import faiss
+
+logger = logging.getLogger(__name__)
+
+# Bump when the on-disk layout changes so old snapshots are ignored
+SNAPSHOT_FORMAT_VERSION = 1
+
+INDEX_FILE = "index.faiss"
+CHUNKS_FILE = "chunks.json"
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+
+# Zero-copy mmap of flat index codes (faiss >= 1.10), plain mmap otherwise
+MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+def compute_content_hash(chunks: list, embedding_model: str) -> str:
+    """Hash of everything that determines the index: format, model and chunk contents."""
+    digest = hashlib.sha256()
+    digest.update(f"v{SNAPSHOT_FORMAT_VERSION}\0{embedding_model}\0".encode("utf-8"))
+    for chunk in chunks:
+        digest.update(chunk["source"].encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(chunk["content"].encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def read_current_hash(base_dir: str):
+    try:
+        with open(os.path.join(base_dir, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def set_current_hash(base_dir: str, content_hash: str):
+    tmp_current = os.path.join(base_dir, f".{CURRENT_FILE}.{os.getpid()}")
+    with open(tmp_current, "w", encoding="utf-8") as f:
+        f.write(content_hash)
+    os.replace(tmp_current, os.path.join(base_dir, CURRENT_FILE))
+
+
+def _write_json(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def save_snapshot(base_dir: str, content_hash: str, index, chunks: list, manifest: dict) -> str:
+    """Write a snapshot under base_dir/<content_hash>/ and point CURRENT at it.
+
+    Files are written to a temporary directory first and moved into place,
+    so replicas reading the shared directory never see a partial snapshot.
+    """
+    os.makedirs(base_dir, exist_ok=True)
+    snapshot_dir = os.path.join(base_dir, content_hash)
+
+    if not os.path.exists(snapshot_dir):
+        tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=base_dir)
+        try:
+            faiss.write_index(index, os.path.join(tmp_dir, INDEX_FILE))
+            _write_json(os.path.join(tmp_dir, CHUNKS_FILE), chunks)
+            _write_json(os.path.join(tmp_dir, MANIFEST_FILE), {
+                **manifest,
+                "format_version": SNAPSHOT_FORMAT_VERSION,
+                "content_hash": content_hash,
+                "num_chunks": len(chunks),
+                "created_at": time.time()
+            })
+            os.rename(tmp_dir, snapshot_dir)
+        except OSError:
+            # Another replica published the same snapshot first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not os.path.exists(snapshot_dir):
+                raise
+
+    set_current_hash(base_dir, content_hash)
+    logger.info(f"Saved knowledge base snapshot {content_hash[:12]} ({len(chunks)} chunks)")
+    return snapshot_dir
+
+
+def _is_snapshot_dir(base_dir, name):
+    return len(name) == 64 and all(c in "0123456789abcdef" for c in name) and os.path.isdir(os.path.join(base_dir, name))
+
+
+def prune_snapshots(base_dir: str, keep: int = 2) -> list:
+    """Delete all but the CURRENT snapshot and the `keep - 1` most recent others.
+
+    The previous snapshot is kept by default so replicas that haven't
+    switched yet can still load it. Returns the removed content hashes.
+    """
+    current = read_current_hash(base_dir)
+    try:
+        others = [name for name in os.listdir(base_dir) if name != current and _is_snapshot_dir(base_dir, name)]
+        others.sort(key=lambda name: os.path.getmtime(os.path.join(base_dir, name)), reverse=True)
+    except OSError as e:
+        logger.error(f"Failed to list knowledge base snapshots: {e}")
+        return []
+
+    removed = others[max(0, keep - 1):] if current else []
+    for content_hash in removed:
+        shutil.rmtree(os.path.join(base_dir, content_hash), ignore_errors=True)
+        logger.info(f"Removed old knowledge base snapshot {content_hash[:12]}")
+    return removed
+
+
+def load_snapshot(base_dir: str, content_hash: str = None):
+    """Load (index, chunks, manifest) for the given or CURRENT snapshot, or None.
+
+    The FAISS index is memory-mapped read-only, so replicas on the same
+    host share its pages through the OS page cache.
+    """
+    content_hash = content_hash or read_current_hash(base_dir)
+    if not content_hash:
+        return None
+
+    snapshot_dir = os.path.join(base_dir, content_hash)
+    if not os.path.isdir(snapshot_dir):
+        return None
+    try:
+        with open(os.path.join(snapshot_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+            logger.info(f"Ignoring snapshot {content_hash[:12]} with format version {manifest.get('format_version')}")
+            return None
+        with open(os.path.join(snapshot_dir, CHUNKS_FILE), "r", encoding="utf-8") as f:
+            chunks = json.load(f)
+        index = faiss.read_index(os.path.join(snapshot_dir, INDEX_FILE), MMAP_FLAGS)
+    except (OSError, ValueError, RuntimeError) as e:
+        logger.error(f"Failed to load knowledge base snapshot {content_hash[:12]}: {e}")
+        return None
+
+    if index.ntotal != len(chunks):
+        logger.error(f"Snapshot {content_hash[:12]} is inconsistent: {index.ntotal} vectors, {len(chunks)} chunks")
+        return None
+    return index, chunks, manifest
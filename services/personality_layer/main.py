@@ -1,8 +1,11 @@
 from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
 from services.personality_layer.personality_layer import PersonalityLayer
+from shared.utils.llm_client import close_llm_client
+from shared.utils.metrics import metrics_response
 from contextlib import asynccontextmanager
 
 app = FastAPI()
@@ -25,6 +28,7 @@ async def lifespan(app: FastAPI):
     agent = PersonalityLayer()
     app.state.agent = agent
     yield
+    await close_llm_client()
     
 app.state.agent = None  
 
@@ -36,8 +40,23 @@ async def handle_support_request(request: QuestionRequest):
     if not agent:
         return {"error": "Agent not initialized"}
     
-    response = agent.run(request.raw_response, request.question)
+    response = await agent.run(request.raw_response, request.question)
     return response
 
+@app.post("/handle_request/stream")
+async def handle_support_request_stream(request: QuestionRequest):
+    agent = app.state.agent
+    if not agent:
+        return {"error": "Agent not initialized"}
+
+    return StreamingResponse(
+        agent.run_stream(request.raw_response, request.question),
+        media_type="text/plain; charset=utf-8"
+    )
+
+@app.get("/metrics")
+async def metrics():
+    return metrics_response()
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000)
\ No newline at end of file
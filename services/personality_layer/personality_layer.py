@@ -1,19 +1,12 @@
-import os
-import requests
+import httpx
 import logging
 from dotenv import load_dotenv
-from shared.utils.load_prompt import load_prompt_template
+from shared.utils.load_prompt import format_prompt
+from shared.utils.llm_client import get_llm_client
+from shared.utils.metrics import track_stage
 
 load_dotenv()
 
-API_ENDPOINT = os.getenv("API_ENDPOINT")
-API_KEY = os.getenv("API_KEY")
-
-HEADERS = {
-    "Content-Type": "application/json",
-    "api-key": API_KEY
-}
-
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -21,33 +14,43 @@ logger = logging.getLogger(__name__)
 class PersonalityLayer:
     def __init__(self):
         self.personality_prompt_path = "shared/prompts/personality_layer_prompt.txt"
+        self.llm = get_llm_client()
 
-    def run(self, raw_response, Question):
+    def _messages(self, raw_response, Question):
         # Format the prompt with the raw response and the user's question
-        prompt = load_prompt_template(self.personality_prompt_path)
-        prompt = prompt.format(raw_response=raw_response, user_message=Question)
+        prompt = format_prompt(self.personality_prompt_path, raw_response=raw_response, user_message=Question)
+        return [{"role": "user", "content": prompt}]
 
-        payload = {
-            "messages": [
-                {"role": "user", "content": prompt},
-            ]
-        }
+    async def run(self, raw_response, Question):
+        payload = {"messages": self._messages(raw_response, Question)}
 
         try:
             logger.info("Sending request to LLM for personality layer processing.")
-            resp = requests.post(API_ENDPOINT, headers=HEADERS, json=payload)
-            resp.raise_for_status()
-            
-            final_resp = resp.json()
+            with track_stage("personality_llm"):
+                message = await self.llm.chat_message(payload["messages"])
 
             # Extract the response from the LLM
-            final_response = final_resp["choices"][0]["message"]["content"]
+            final_response = message["content"]
             logger.info(f"Received final response from LLM: {final_response}")
 
             return final_response
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"[Personality Error] Request failed: {e}")
             return raw_response
         except Exception as e:
             logger.error(f"[Personality Error] Unexpected error: {e}")
-            return raw_response
\ No newline at end of file
+            return raw_response
+
+    async def run_stream(self, raw_response, Question):
+        """Same as run() but yields the rewritten response token by token."""
+        streamed = False
+        try:
+            logger.info("Streaming personality layer response from LLM.")
+            with track_stage("personality_llm"):
+                async for token in self.llm.stream_chat(self._messages(raw_response, Question)):
+                    streamed = True
+                    yield token
+        except Exception as e:
+            logger.error(f"[Personality Error] Streaming failed: {e}")
+            if not streamed:
+                yield raw_response
@@ -0,0 +1,217 @@
+import os
+import re
+import json
+import base64
+import logging
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+AGENT_HEADER_RE = re.compile(r"^\s*\d+\.\s+\*\*(\w+)\*\*")
+EXAMPLE_QUERY_RE = re.compile(r"^\s*-\s+\"(.+)\"\s*$")
+
+
+def parse_prompt_examples(prompt_text: str) -> list:
+    """Extract (query, agent) pairs from the "Example Queries" of the router prompt."""
+    examples = []
+    current_agent = None
+    for line in prompt_text.splitlines():
+        header = AGENT_HEADER_RE.match(line)
+        if header:
+            current_agent = header.group(1)
+            continue
+        example = EXAMPLE_QUERY_RE.match(line)
+        if example and current_agent:
+            examples.append((example.group(1), current_agent))
+    return examples
+
+
+def read_tail_lines(path: str, limit: int, block_size: int = 65536) -> list:
+    """Return the last `limit` lines of a file without reading the rest of it."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b""
+        while position > 0 and data.count(b"\n") <= limit:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    return [line.decode("utf-8", errors="ignore") for line in data.splitlines()[-limit:]]
+
+
+def encode_embedding(embedding) -> str:
+    return base64.b64encode(np.asarray(embedding, dtype=np.float32).tobytes()).decode("ascii")
+
+
+def decode_embedding(text: str):
+    return np.frombuffer(base64.b64decode(text), dtype=np.float32)
+
+
+def load_logged_decisions(path: str, limit: int, model_id: str = None) -> list:
+    """Read the most recent (embedding, agent) routing decisions from a JSONL log.
+
+    Records written with a different embedding model are skipped.
+    """
+    if not path or not os.path.exists(path):
+        return []
+    decisions = []
+    try:
+        for line in read_tail_lines(path, limit):
+            try:
+                record = json.loads(line)
+                if model_id and record.get("model") != model_id:
+                    continue
+                decisions.append((decode_embedding(record["embedding"]), record["agent"]))
+            except (json.JSONDecodeError, KeyError, ValueError):
+                continue
+    except OSError as e:
+        logger.error(f"Failed to read routing decision log: {e}")
+    return decisions
+
+
+class NearestCentroidClassifier:
+    """Nearest-centroid classifier over normalized sentence embeddings.
+
+    Each label keeps a running sum of its example embeddings, so new
+    examples can be added online. Confidence is the softmax of the cosine
+    similarities to every centroid.
+    """
+
+    def __init__(self, temperature: float = 0.05, min_examples: int = 1):
+        self.temperature = temperature
+        self.min_examples = min_examples
+        self._sums = {}
+        self._counts = {}
+        self._snapshot = ([], None)  # (labels, centroids), replaced as a whole
+        self._lock = threading.Lock()
+
+    @property
+    def labels(self):
+        return self._snapshot[0]
+
+    def add_examples(self, embeddings, labels):
+        with self._lock:
+            for embedding, label in zip(embeddings, labels):
+                embedding = np.asarray(embedding, dtype=np.float32)
+                if label not in self._sums:
+                    self._sums[label] = np.zeros_like(embedding)
+                    self._counts[label] = 0
+                self._sums[label] += embedding
+                self._counts[label] += 1
+            self._refresh_centroids()
+
+    def _refresh_centroids(self):
+        # Only labels with enough examples get a centroid; a centroid from a handful of
+        # seed prompts is too noisy to route on
+        labels = sorted(label for label, count in self._counts.items() if count >= self.min_examples)
+        if not labels:
+            self._snapshot = ([], None)
+            return
+        centroids = np.stack([self._sums[label] / self._counts[label] for label in labels])
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        # Published in one assignment so predict() never pairs new labels with old centroids
+        self._snapshot = (labels, centroids / np.maximum(norms, 1e-12))
+
+    def predict(self, embedding):
+        """Return (label, confidence), or (None, 0.0) until two labels have enough examples."""
+        labels, centroids = self._snapshot
+        if centroids is None or len(labels) < 2:
+            return None, 0.0
+        sims = centroids @ np.asarray(embedding, dtype=np.float32)
+        logits = (sims - sims.max()) / self.temperature
+        probs = np.exp(logits) / np.exp(logits).sum()
+        idx = int(np.argmax(probs))
+        return labels[idx], float(probs[idx])
+
+    def example_counts(self) -> dict:
+        return dict(self._counts)
+
+
+class LocalRouterClassifier:
+    """Local fast path for RouterAgent.
+
+    Seeded from the router prompt's example queries and the routing
+    decisions logged by earlier LLM calls. Every new LLM decision is
+    appended to the log and folded into the centroids. The log keeps only
+    the message embedding and the chosen agent, never the message text,
+    and is compacted to its last `max_logged_examples` records once it
+    holds twice that many.
+    """
+
+    def __init__(self, embed_batch, threshold: float, decision_log_path: str = None,
+                 max_logged_examples: int = 5000, model_id: str = None, min_examples: int = 20):
+        self.embed_batch = embed_batch
+        self.threshold = threshold
+        self.decision_log_path = decision_log_path
+        self.model_id = model_id
+        self.model = NearestCentroidClassifier(min_examples=min_examples)
+        self.hits = 0
+        self.fallbacks = 0
+        self._log_lock = threading.Lock()
+        self.max_logged_examples = max_logged_examples
+        self._log_lines = None  # counted on first write
+
+    def seed(self, prompt_text: str):
+        examples = parse_prompt_examples(prompt_text)
+        logged = load_logged_decisions(self.decision_log_path, self.max_logged_examples, self.model_id)
+        if not examples and not logged:
+            logger.warning("No examples found to seed the local router classifier.")
+            return
+        if examples:
+            self.model.add_examples(self.embed_batch([text for text, _ in examples]), [label for _, label in examples])
+        if logged:
+            # Logged decisions are stored as embeddings, no need to encode them again
+            self.model.add_examples([embedding for embedding, _ in logged], [label for _, label in logged])
+        logger.info(f"Local router classifier seeded with {len(examples) + len(logged)} examples: {self.model.example_counts()}")
+
+    def predict(self, embedding):
+        """Return the agent name when confident enough, otherwise None."""
+        label, confidence = self.model.predict(embedding)
+        if label is not None and confidence >= self.threshold:
+            self.hits += 1
+            return label, confidence
+        self.fallbacks += 1
+        return None, confidence
+
+    def _compact_log(self):
+        lines = read_tail_lines(self.decision_log_path, self.max_logged_examples)
+        tmp_path = self.decision_log_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(line + "\n" for line in lines)
+        os.replace(tmp_path, self.decision_log_path)
+        self._log_lines = len(lines)
+
+    def record(self, embedding, label: str):
+        """Learn from an LLM routing decision and append it to the decision log."""
+        self.model.add_examples([embedding], [label])
+        if not self.decision_log_path:
+            return
+        record = {"agent": label, "model": self.model_id, "embedding": encode_embedding(embedding)}
+        try:
+            with self._log_lock:
+                os.makedirs(os.path.dirname(self.decision_log_path) or ".", exist_ok=True)
+                if self._log_lines is None:
+                    with open(self.decision_log_path, "a+", encoding="utf-8") as f:
+                        f.seek(0)
+                        self._log_lines = sum(1 for _ in f)
+                with open(self.decision_log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+                self._log_lines += 1
+                if self._log_lines >= 2 * self.max_logged_examples:
+                    self._compact_log()
+        except OSError as e:
+            logger.error(f"Failed to log routing decision: {e}")
+
+    def stats(self) -> dict:
+        total = self.hits + self.fallbacks
+        return {
+            "threshold": self.threshold,
+            "min_examples": self.model.min_examples,
+            "active_labels": self.model.labels,
+            "examples": self.model.example_counts(),
+            "hits": self.hits,
+            "llm_fallbacks": self.fallbacks,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
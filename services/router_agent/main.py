@@ -1,8 +1,12 @@
 from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
 from services.router_agent.router_agent import RouterAgent
+from shared.utils.llm_client import close_llm_client
+from shared.utils.metrics import metrics_response
+from shared.utils.inference import shutdown_inference_executor
 from contextlib import asynccontextmanager
 
 app = FastAPI()
@@ -23,8 +27,12 @@ app.add_middleware(
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     agent = RouterAgent()
+    agent.start()
     app.state.agent = agent
     yield
+    await agent.aclose()
+    await close_llm_client()
+    shutdown_inference_executor()
     
 app.state.agent = None  
 
@@ -36,8 +44,45 @@ async def handle_support_request(request: QuestionRequest):
     if not agent:
         return {"error": "Agent not initialized"}
     
-    response = agent.run(request.user_id, request.message)
+    response = await agent.run(request.user_id, request.message)
     return response
 
+@app.post("/ask/stream")
+async def handle_support_request_stream(request: QuestionRequest):
+    agent = app.state.agent
+    if not agent:
+        return {"error": "Agent not initialized"}
+
+    return StreamingResponse(
+        agent.run_stream(request.user_id, request.message),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/router_cache/stats")
+async def router_cache_stats():
+    agent = app.state.agent
+    if not agent or agent.cache is None:
+        return {"error": "Router cache disabled"}
+    return agent.cache.stats()
+
+@app.get("/router_classifier/stats")
+async def router_classifier_stats():
+    agent = app.state.agent
+    if not agent or agent.local_classifier is None:
+        return {"error": "Local router classifier disabled"}
+    return agent.local_classifier.stats()
+
+@app.get("/resilience/stats")
+async def resilience_stats():
+    agent = app.state.agent
+    if not agent:
+        return {"error": "Agent not initialized"}
+    return {"llm": agent.llm.stats(), "agents": agent.transport.stats()}
+
+@app.get("/metrics")
+async def metrics():
+    return metrics_response()
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -1,43 +1,143 @@
 import os
 import json
-import requests
+import uuid
+import asyncio
+import httpx
 import logging
 from dotenv import load_dotenv
 from shared.utils.load_prompt import load_prompt_template
+from shared.utils.llm_client import get_llm_client
+from shared.utils.embedding_backend import create_embedding_backend
+from services.router_agent.semantic_cache import SemanticCache
+from services.router_agent.local_classifier import LocalRouterClassifier
+from services.router_agent.transport import HttpTransport, create_in_process_transport
+from shared.utils.metrics import track_stage
 
 load_dotenv()
 
-API_ENDPOINT = os.getenv("API_ENDPOINT")
-API_KEY = os.getenv("API_KEY")
+# "microservices": agents are separate services reached over HTTP
+# "monolith": every agent runs inside the router process
+DEPLOYMENT_MODE = os.getenv("DEPLOYMENT_MODE", "microservices").lower()
 
-HEADERS = {
-    "Content-Type": "application/json",
-    "api-key": API_KEY
-}
+# Semantic cache for routing decisions
+ROUTER_CACHE_ENABLED = os.getenv("ROUTER_CACHE_ENABLED", "true").lower() == "true"
+ROUTER_CACHE_THRESHOLD = float(os.getenv("ROUTER_CACHE_THRESHOLD", "0.9"))
+ROUTER_CACHE_TTL = float(os.getenv("ROUTER_CACHE_TTL", "3600"))
+ROUTER_CACHE_SIZE = int(os.getenv("ROUTER_CACHE_SIZE", "2048"))
+# Local nearest-centroid classifier tried before the LLM
+# Off until ROUTER_LOCAL_THRESHOLD has been measured against the benchmarks/load_test workload
+ROUTER_LOCAL_CLASSIFIER_ENABLED = os.getenv("ROUTER_LOCAL_CLASSIFIER_ENABLED", "false").lower() == "true"
+ROUTER_LOCAL_THRESHOLD = float(os.getenv("ROUTER_LOCAL_THRESHOLD", "0.85"))
+# Examples (seed prompts plus logged LLM decisions) an agent needs before it can be routed locally.
+# The prompt seeds 3 per agent, so once enabled the router learns from its own LLM decisions
+# (persisted in ROUTER_DECISION_LOG) until each agent reaches this count, see the README
+ROUTER_LOCAL_MIN_EXAMPLES = int(os.getenv("ROUTER_LOCAL_MIN_EXAMPLES", "20"))
+ROUTER_DECISION_LOG = os.getenv("ROUTER_DECISION_LOG", "data/router_decisions.jsonl")
+
+# Speculative retrieval prefetch on the agents while the router classifies
+ROUTER_SPECULATIVE_PREFETCH = os.getenv("ROUTER_SPECULATIVE_PREFETCH", "true").lower() == "true"
+
+ROUTER_EMBEDDING_MODEL = os.getenv("ROUTER_EMBEDDING_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+ROUTER_EMBEDDING_BACKEND = os.getenv("ROUTER_EMBEDDING_BACKEND", "torch")
+
+# Agent service base URLs (docker-compose hostnames by default, e.g. http://localhost:8003 when run locally)
+KNOWLEDGE_AGENT_URL = os.getenv("KNOWLEDGE_AGENT_URL", "http://knowledge:8000")
+SUPPORT_AGENT_URL = os.getenv("SUPPORT_AGENT_URL", "http://customer-support:8000")
+GENERAL_AGENT_URL = os.getenv("GENERAL_AGENT_URL", "http://general:8000")
+PERSONALITY_LAYER_URL = os.getenv("PERSONALITY_LAYER_URL", "http://personality:8000")
 
 AGENT_URLS = {
-    "KnowledgeAgent": "http://knowledge:8000/handle_request",  
-    "CustomerSupportAgent": "http://customer-support:8000/handle_request",
-    "GeneralAgent": "http://general:8000/handle_request",  
-    "PersonalityLayer": "http://personality:8000/handle_request"  
+    "KnowledgeAgent": f"{KNOWLEDGE_AGENT_URL}/handle_request",  
+    "CustomerSupportAgent": f"{SUPPORT_AGENT_URL}/handle_request",
+    "GeneralAgent": f"{GENERAL_AGENT_URL}/handle_request",  
+    "PersonalityLayer": f"{PERSONALITY_LAYER_URL}/handle_request"  
 }
 
-# AGENT_URLS = {
-#     "KnowledgeAgent": "http://localhost:8003/handle_request",  
-#     "CustomerSupportAgent": "http://localhost:8001/handle_request",
-#     "GeneralAgent": "http://localhost:8002/handle_request",  
-#     "PersonalityLayer": "http://localhost:8004/handle_request"  
-# }
+# Agents that can start their retrieval before the routing decision is made
+PREFETCH_URLS = {
+    "KnowledgeAgent": f"{KNOWLEDGE_AGENT_URL}/prefetch",
+    "CustomerSupportAgent": f"{SUPPORT_AGENT_URL}/prefetch"
+}
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Format one server-sent event
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 class RouterAgent:
-    def __init__(self):
+    def __init__(self, transport=None):
         self.agent_prompt_path = "shared/prompts/router_agent_prompt.txt"
+        self.llm = get_llm_client()
+        if transport is None:
+            if DEPLOYMENT_MODE == "monolith":
+                transport = create_in_process_transport()
+            else:
+                transport = HttpTransport(AGENT_URLS, PREFETCH_URLS)
+        self.transport = transport
+        self._background_tasks = set()
+        self.embedder = None
+        self.cache = None
+        self.local_classifier = None
+        if ROUTER_CACHE_ENABLED or ROUTER_LOCAL_CLASSIFIER_ENABLED:
+            self.embedder = create_embedding_backend(ROUTER_EMBEDDING_MODEL, ROUTER_EMBEDDING_BACKEND)
+        if ROUTER_CACHE_ENABLED:
+            self.cache = SemanticCache(
+                threshold=ROUTER_CACHE_THRESHOLD,
+                ttl=ROUTER_CACHE_TTL,
+                max_size=ROUTER_CACHE_SIZE
+            )
+        if ROUTER_LOCAL_CLASSIFIER_ENABLED:
+            self.local_classifier = LocalRouterClassifier(
+                embed_batch=lambda texts: self.embedder.encode(texts, normalize_embeddings=True),
+                threshold=ROUTER_LOCAL_THRESHOLD,
+                decision_log_path=ROUTER_DECISION_LOG,
+                model_id=self.embedder.identifier,
+                min_examples=ROUTER_LOCAL_MIN_EXAMPLES
+            )
+            self.local_classifier.seed(load_prompt_template(self.agent_prompt_path))
+
+    async def _embed(self, text):
+        try:
+            # Encoding is CPU-bound, keep it off the event loop
+            return await asyncio.to_thread(self.embedder.encode, text, normalize_embeddings=True)
+        except Exception as e:
+            logger.error(f"[Router Error] Embedding failed: {e}")
+            return None
+
+    async def classify(self, user_input):
+        """Return (agent_name, source) where source is the stage that decided."""
+        embedding = None
+        if self.embedder is not None:
+            embedding = await self._embed(user_input)
+
+        if embedding is not None and self.cache is not None:
+            cached_agent = self.cache.lookup(embedding)
+            if cached_agent:
+                logger.info(f"Chosen agent (semantic cache): {cached_agent}")
+                return cached_agent, "semantic_cache"
+
+        if embedding is not None and self.local_classifier is not None:
+            local_agent, confidence = self.local_classifier.predict(embedding)
+            if local_agent in AGENT_URLS:
+                logger.info(f"Chosen agent (local classifier, confidence {confidence:.2f}): {local_agent}")
+                return local_agent, "local_classifier"
 
-    def decide_agent(self, user_input):
+        agent_name = await self._llm_decide(user_input)
+        if agent_name and embedding is not None:
+            if self.cache is not None:
+                self.cache.add(embedding, agent_name)
+            if self.local_classifier is not None:
+                await asyncio.to_thread(self.local_classifier.record, embedding, agent_name)
+        return agent_name or "KnowledgeAgent", "LLM"
+
+    async def decide_agent(self, user_input):
+        agent_name, _ = await self.classify(user_input)
+        return agent_name
+
+    async def _llm_decide(self, user_input):
         system_prompt = load_prompt_template(self.agent_prompt_path)
         payload = {
             "messages": [
@@ -47,43 +147,98 @@ class RouterAgent:
         }
         try:
             logger.info(f"Sending user input to LLM for agent decision: {user_input}")
-            resp = requests.post(API_ENDPOINT, headers=HEADERS, json=payload)
-            resp.raise_for_status()
-            response = resp.json()
-            agent_name = response["choices"][0]["message"]["content"].strip()
+            with track_stage("router_llm"):
+                message = await self.llm.chat_message(payload["messages"])
+            agent_name = message["content"].strip()
             logger.info(f"Chosen agent: {agent_name}")
-            return agent_name if agent_name in AGENT_URLS else "KnowledgeAgent"
+            return agent_name if agent_name in AGENT_URLS else None
         except Exception as e:
             logger.error(f"[Router Error] {e}")
-            return "KnowledgeAgent"  # Default fallback
+            return None  # classify() falls back to KnowledgeAgent
+
+    def _run_in_background(self, coro):
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
 
-    def run(self, user_id, user_input):
-        chosen_agent_name = self.decide_agent(user_input)
-        agent_url = AGENT_URLS.get(chosen_agent_name, AGENT_URLS["GeneralAgent"])
+    def _start_prefetches(self, request_id, user_id, user_input):
+        if not ROUTER_SPECULATIVE_PREFETCH:
+            return {}
+        payload = {"request_id": request_id, "user_id": user_id, "message": user_input}
+        return {
+            agent_name: asyncio.create_task(self.transport.prefetch(agent_name, payload))
+            for agent_name in self.transport.prefetch_agents
+        }
 
+    async def _cancel_prefetch(self, agent_name, request_id):
+        try:
+            await self.transport.cancel_prefetch(agent_name, request_id)
+        except Exception as e:
+            logger.warning(f"Failed to cancel prefetch on {agent_name}: {e}")
+
+    async def _settle_prefetches(self, prefetches, chosen_agent_name, request_id):
+        """Cancel the losing prefetches, return True if the chosen agent has one running."""
+        prefetched = False
+        for agent_name, task in prefetches.items():
+            if agent_name == chosen_agent_name:
+                try:
+                    prefetched = await task
+                except Exception as e:
+                    logger.warning(f"Prefetch on {agent_name} failed: {e}")
+            else:
+                task.cancel()
+                self._run_in_background(self._cancel_prefetch(agent_name, request_id))
+        return prefetched
+
+    async def _route(self, user_id, user_input):
+        """Classify the message while the retrieval agents prefetch on it."""
+        request_id = uuid.uuid4().hex
+        prefetches = self._start_prefetches(request_id, user_id, user_input)
+        chosen_agent_name, decided_by = await self.classify(user_input)
+        prefetched = await self._settle_prefetches(prefetches, chosen_agent_name, request_id)
+        return chosen_agent_name, decided_by, request_id if prefetched else None
+
+    async def _call_agent(self, agent_name, user_id, user_input, request_id=None):
         payload = {"user_id": user_id, "message": user_input}
+        if request_id:
+            payload["request_id"] = request_id
+        return await self.transport.call_agent(agent_name, payload)
+
+    async def run(self, user_id, user_input):
+        with track_stage("routing") as routing:
+            chosen_agent_name, decided_by, request_id = await self._route(user_id, user_input)
 
         try:
-            logger.info(f"Sending request to {chosen_agent_name} at {agent_url}")
-            response = requests.post(agent_url, json=payload)
-            response.raise_for_status()
-            agent_response = response.json()
+            with track_stage(f"agent_hop:{chosen_agent_name}") as agent_hop:
+                agent_response = await self._call_agent(chosen_agent_name, user_id, user_input, request_id)
 
-            agent_workflow = [{"agent_name": "RouterAgent", "tool_calls": {"LLM": chosen_agent_name}}]
+            agent_workflow = [{"agent_name": "RouterAgent", "tool_calls": {decided_by: chosen_agent_name}, "duration_ms": routing.duration_ms}]
             tool_output = agent_response.get("Response", "")
             agent_workflow.append([{
                 "agent_name": chosen_agent_name,
-                "tool_calls": {"llm_response": tool_output}
+                "tool_calls": {"llm_response": tool_output},
+                "duration_ms": agent_hop.duration_ms
             }])
 
-            logger.info("Sending response to PersonalityLayer for further processing")
-            personality_response = requests.post(AGENT_URLS["PersonalityLayer"], json={"raw_response": tool_output, "question": user_input})
-            final_response = personality_response.json()
+            if agent_response.get("personality_applied"):
+                # The agent already styled its answer in the same generation
+                logger.info(f"{chosen_agent_name} answered in fused personality mode, skipping PersonalityLayer")
+                final_response = tool_output
+                agent_workflow.append({
+                    "agent_name": "PersonalityLayer",
+                    "tool_calls": {"fused": chosen_agent_name},
+                    "duration_ms": 0.0
+                })
+            else:
+                logger.info("Sending response to PersonalityLayer for further processing")
+                with track_stage("personality") as personality:
+                    final_response = await self.transport.personality(tool_output, user_input)
 
-            agent_workflow.append({
-                "agent_name": "PersonalityLayer",
-                "tool_calls": {"LLM": final_response}
-            })
+                agent_workflow.append({
+                    "agent_name": "PersonalityLayer",
+                    "tool_calls": {"LLM": final_response},
+                    "duration_ms": personality.duration_ms
+                })
 
             logger.info(f"Returning final response: {final_response}")
 
@@ -93,7 +248,7 @@ class RouterAgent:
                 "agent_workflow": agent_workflow
             }
 
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Request error: {e}")
             return {"error": f"Error calling {chosen_agent_name}: {str(e)}"}
 
@@ -104,3 +259,75 @@ class RouterAgent:
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
             return {"error": "An unexpected error occurred"}
+
+    async def run_stream(self, user_id, user_input):
+        """Same flow as run() but yields server-sent events.
+
+        An `agent_workflow` event is emitted as each hop finishes, PersonalityLayer
+        output is forwarded as `token` events while the LLM produces it, and a final
+        `done` event carries the same body /ask would have returned.
+        """
+        with track_stage("routing") as routing:
+            chosen_agent_name, decided_by, request_id = await self._route(user_id, user_input)
+        router_step = {"agent_name": "RouterAgent", "tool_calls": {decided_by: chosen_agent_name}, "duration_ms": routing.duration_ms}
+        yield sse_event("agent_workflow", router_step)
+
+        try:
+            with track_stage(f"agent_hop:{chosen_agent_name}") as agent_hop:
+                agent_response = await self._call_agent(chosen_agent_name, user_id, user_input, request_id)
+            tool_output = agent_response.get("Response", "")
+            agent_step = [{
+                "agent_name": chosen_agent_name,
+                "tool_calls": {"llm_response": tool_output},
+                "duration_ms": agent_hop.duration_ms
+            }]
+            yield sse_event("agent_workflow", agent_step)
+
+            if agent_response.get("personality_applied"):
+                logger.info(f"{chosen_agent_name} answered in fused personality mode, skipping PersonalityLayer")
+                final_response = tool_output
+                yield sse_event("token", {"content": final_response})
+                personality_step = {
+                    "agent_name": "PersonalityLayer",
+                    "tool_calls": {"fused": chosen_agent_name},
+                    "duration_ms": 0.0
+                }
+            else:
+                logger.info("Streaming response from PersonalityLayer")
+                tokens = []
+                with track_stage("personality") as personality:
+                    async for token in self.transport.personality_stream(tool_output, user_input):
+                        tokens.append(token)
+                        yield sse_event("token", {"content": token})
+                final_response = "".join(tokens)
+
+                personality_step = {
+                    "agent_name": "PersonalityLayer",
+                    "tool_calls": {"LLM": final_response},
+                    "duration_ms": personality.duration_ms
+                }
+            yield sse_event("agent_workflow", personality_step)
+
+            yield sse_event("done", {
+                "response": final_response,
+                "source_agent_response": tool_output,
+                "agent_workflow": [router_step, agent_step, personality_step]
+            })
+
+        except httpx.HTTPError as e:
+            logger.error(f"Request error: {e}")
+            yield sse_event("error", {"error": f"Error calling {chosen_agent_name}: {str(e)}"})
+
+        except json.JSONDecodeError as e:
+            logger.error(f"JSON decode error: {e}")
+            yield sse_event("error", {"error": "Error decoding response from agent"})
+
+        except Exception as e:
+            logger.error(f"Unexpected error: {e}")
+            yield sse_event("error", {"error": "An unexpected error occurred"})
+
+    def start(self):
+        self.transport.start()
+
+    async def aclose(self):
+        await self.transport.aclose()
@@ -0,0 +1,90 @@
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+class SemanticCache:
+    """LRU + TTL cache keyed on normalized message embeddings.
+
+    A lookup returns the value stored for the most similar cached embedding
+    when its cosine similarity is at least `threshold`. Vectors live in a
+    preallocated matrix so a lookup is a single matrix-vector product.
+    """
+
+    def __init__(self, threshold: float = 0.9, ttl: float = 3600, max_size: int = 2048):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._vectors = None
+        self._valid = np.zeros(max_size, dtype=bool)
+        self._entries = OrderedDict()  # slot -> (value, expires_at), oldest first
+        self._free_slots = list(range(max_size - 1, -1, -1))
+        self._lock = threading.Lock()
+
+    def _release(self, slot):
+        self._entries.pop(slot, None)
+        self._valid[slot] = False
+        self._free_slots.append(slot)
+
+    def lookup(self, embedding):
+        embedding = np.asarray(embedding, dtype=np.float32)
+        now = time.monotonic()
+        with self._lock:
+            if self._vectors is None or not self._entries:
+                self.misses += 1
+                return None
+
+            sims = self._vectors @ embedding
+            sims[~self._valid] = -1.0
+            slot = int(np.argmax(sims))
+            if sims[slot] < self.threshold:
+                self.misses += 1
+                return None
+
+            value, expires_at = self._entries[slot]
+            if expires_at < now:
+                self._release(slot)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(slot)
+            self.hits += 1
+            return value
+
+    def add(self, embedding, value):
+        embedding = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_size, embedding.shape[0]), dtype=np.float32)
+
+            if not self._free_slots:
+                oldest = next(iter(self._entries))
+                self._release(oldest)
+                self.evictions += 1
+
+            slot = self._free_slots.pop()
+            self._vectors[slot] = embedding
+            self._valid[slot] = True
+            self._entries[slot] = (value, time.monotonic() + self.ttl)
+
+    def clear(self):
+        with self._lock:
+            for slot in list(self._entries):
+                self._release(slot)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "threshold": self.threshold,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
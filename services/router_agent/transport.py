@@ -0,0 +1,161 @@
+import os
+import logging
+from dotenv import load_dotenv
+from shared.utils.llm_client import create_http_client, LLM_CALL_BUDGET
+from shared.utils.tool_calls import TOOL_TIMEOUT
+from shared.utils.resilience import CircuitBreaker, RetryPolicy, is_connect_error
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Read timeout for a whole agent hop. It must cover the agent's own LLM call (with its retries)
+# and its tool calls, otherwise the router gives up on work that is still running downstream
+AGENT_HOP_TIMEOUT = float(os.getenv("AGENT_HOP_TIMEOUT", str(LLM_CALL_BUDGET + TOOL_TIMEOUT + 5)))
+# Connections to the agents and PersonalityLayer, sized for many requests in flight; when all are busy
+# a hop waits at most AGENT_HOP_POOL_TIMEOUT for one instead of the whole read timeout
+AGENT_HOP_POOL_SIZE = int(os.getenv("AGENT_HOP_POOL_SIZE", "200"))
+AGENT_HOP_POOL_TIMEOUT = float(os.getenv("AGENT_HOP_POOL_TIMEOUT", "5"))
+# Agent calls can have side effects (tickets, Slack alerts), so only connect failures are retried
+AGENT_HOP_RETRIES = int(os.getenv("AGENT_HOP_RETRIES", "2"))
+AGENT_BREAKER_FAILURES = int(os.getenv("AGENT_BREAKER_FAILURES", "5"))
+AGENT_BREAKER_RESET = float(os.getenv("AGENT_BREAKER_RESET", "30"))
+
+
+class HttpTransport:
+    """Reaches the agents and the PersonalityLayer as separate services over HTTP."""
+
+    def __init__(self, agent_urls: dict, prefetch_urls: dict):
+        self.agent_urls = agent_urls
+        self.prefetch_urls = prefetch_urls
+        # Pooled keep-alive client for the agent and PersonalityLayer hops
+        self.http = create_http_client(AGENT_HOP_POOL_SIZE, AGENT_HOP_TIMEOUT, pool_timeout=AGENT_HOP_POOL_TIMEOUT)
+        self.retry = RetryPolicy(AGENT_HOP_RETRIES, retry_on=is_connect_error)
+        # One breaker per downstream service, so a failing agent doesn't block the others
+        self.breakers = {
+            name: CircuitBreaker(name, AGENT_BREAKER_FAILURES, AGENT_BREAKER_RESET)
+            for name in agent_urls
+        }
+
+    async def _post(self, name, url, payload):
+        async def attempt():
+            response = await self.http.post(url, json=payload)
+            response.raise_for_status()
+            return response.json()
+        return await self.breakers[name].call(lambda: self.retry.run(attempt))
+
+    @property
+    def prefetch_agents(self):
+        return list(self.prefetch_urls)
+
+    async def call_agent(self, agent_name, payload):
+        if agent_name not in self.agent_urls:
+            agent_name = "GeneralAgent"
+        agent_url = self.agent_urls[agent_name]
+        logger.info(f"Sending request to {agent_name} at {agent_url}")
+        return await self._post(agent_name, agent_url, payload)
+
+    async def prefetch(self, agent_name, payload) -> bool:
+        response = await self.http.post(self.prefetch_urls[agent_name], json=payload)
+        return response.status_code == 200
+
+    async def cancel_prefetch(self, agent_name, request_id):
+        await self.http.delete(f"{self.prefetch_urls[agent_name]}/{request_id}")
+
+    async def personality(self, raw_response, question):
+        return await self._post("PersonalityLayer", self.agent_urls["PersonalityLayer"], {"raw_response": raw_response, "question": question})
+
+    async def personality_stream(self, raw_response, question):
+        async for token in self.breakers["PersonalityLayer"].stream(self._personality_stream(raw_response, question)):
+            yield token
+
+    async def _personality_stream(self, raw_response, question):
+        stream_url = self.agent_urls["PersonalityLayer"] + "/stream"
+        async with self.http.stream("POST", stream_url, json={"raw_response": raw_response, "question": question}) as response:
+            response.raise_for_status()
+            async for token in response.aiter_text():
+                yield token
+
+    def stats(self) -> dict:
+        return {name: breaker.stats() for name, breaker in self.breakers.items()}
+
+    def start(self):
+        # The agents run their own background workers in their services
+        pass
+
+    async def aclose(self):
+        await self.http.aclose()
+
+
+class InProcessTransport:
+    """Calls agent and PersonalityLayer instances living in the router's process.
+
+    Same interface and payloads as HttpTransport, minus the network hops and
+    JSON round trips.
+    """
+
+    def __init__(self, agents: dict, personality):
+        self.agents = agents
+        self.personality_layer = personality
+
+    @property
+    def prefetch_agents(self):
+        return [name for name, agent in self.agents.items() if hasattr(agent, "prefetch")]
+
+    async def call_agent(self, agent_name, payload):
+        agent = self.agents.get(agent_name, self.agents["GeneralAgent"])
+        logger.info(f"Calling {agent_name} in process")
+        if payload.get("request_id"):
+            return await agent.handle(payload["user_id"], payload["message"], payload["request_id"])
+        return await agent.handle(payload["user_id"], payload["message"])
+
+    async def prefetch(self, agent_name, payload) -> bool:
+        self.agents[agent_name].prefetch(payload["request_id"], payload["message"])
+        return True
+
+    async def cancel_prefetch(self, agent_name, request_id):
+        self.agents[agent_name].prefetches.cancel(request_id)
+
+    async def personality(self, raw_response, question):
+        return await self.personality_layer.run(raw_response, question)
+
+    async def personality_stream(self, raw_response, question):
+        async for token in self.personality_layer.run_stream(raw_response, question):
+            yield token
+
+    def stats(self) -> dict:
+        return {}
+
+    def start(self):
+        """Start the agents' background workers; must be called with the event loop running."""
+        support = self.agents.get("CustomerSupportAgent")
+        if support is not None:
+            support.outbox.start()
+
+    async def aclose(self):
+        knowledge = self.agents.get("KnowledgeAgent")
+        if knowledge is not None:
+            await knowledge.search_batcher.aclose()
+        support = self.agents.get("CustomerSupportAgent")
+        if support is not None:
+            await support.outbox.aclose()
+        general = self.agents.get("GeneralAgent")
+        if general is not None:
+            await general.alerts.aclose()
+
+
+def create_in_process_transport() -> InProcessTransport:
+    """Load every agent into this process (DEPLOYMENT_MODE=monolith)."""
+    # Imported here so the microservice router image doesn't need the agents' dependencies
+    from services.knowledge_agent.knowledge_agent import KnowledgeAgent
+    from services.customer_support_agent.customer_support_agent import SupportAgent
+    from services.general_agent.general_agent import GeneralAgent
+    from services.personality_layer.personality_layer import PersonalityLayer
+
+    logger.info("Loading all agents in process (monolith mode)...")
+    agents = {
+        "KnowledgeAgent": KnowledgeAgent(),
+        "CustomerSupportAgent": SupportAgent(),
+        "GeneralAgent": GeneralAgent()
+    }
+    return InProcessTransport(agents, PersonalityLayer())
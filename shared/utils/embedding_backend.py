@@ -0,0 +1,109 @@
+import os
+import logging
+import numpy as np
+from dotenv import load_dotenv
+
+try:
+    # LangChain vectorstores expect an Embeddings instance
+    from langchain_core.embeddings import Embeddings
+except ImportError:
+    Embeddings = object
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Where exported and quantized ONNX models are cached
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", "data/onnx_models")
+# Dynamic int8 quantization target: arm64, avx2, avx512 or avx512_vnni
+EMBEDDING_ONNX_QUANTIZATION = os.getenv("EMBEDDING_ONNX_QUANTIZATION", "avx2")
+
+BACKENDS = ("torch", "onnx")
+
+
+class EmbeddingBackend(Embeddings):
+    """Sentence embedding model behind one interface for every service.
+
+    encode() mirrors SentenceTransformer.encode and returns a float32 array;
+    embed_documents() / embed_query() make the backend usable as a
+    LangChain embedding function.
+    """
+
+    name = None
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.model = None
+
+    @property
+    def identifier(self) -> str:
+        """Stable ID of the vectors this backend produces, for snapshot hashes."""
+        return self.model_name
+
+    def encode(self, texts, normalize_embeddings: bool = False):
+        vectors = self.model.encode(texts, normalize_embeddings=normalize_embeddings, convert_to_numpy=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+    def embed_documents(self, texts):
+        return self.encode(list(texts)).tolist()
+
+    def embed_query(self, text):
+        return self.encode(text).tolist()
+
+
+class TorchEmbeddingBackend(EmbeddingBackend):
+    """Full-precision PyTorch SentenceTransformer."""
+
+    name = "torch"
+
+    def __init__(self, model_name: str):
+        super().__init__(model_name)
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+
+class OnnxEmbeddingBackend(EmbeddingBackend):
+    """Int8 dynamically quantized ONNX Runtime export of a SentenceTransformer.
+
+    The model is exported and quantized on first use and cached under
+    EMBEDDING_ONNX_DIR, so later starts load the quantized file directly.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_name: str, quantization: str = EMBEDDING_ONNX_QUANTIZATION,
+                 cache_dir: str = EMBEDDING_ONNX_DIR):
+        super().__init__(model_name)
+        from sentence_transformers import SentenceTransformer
+        self.quantization = quantization
+        model_dir = os.path.join(cache_dir, model_name.replace("/", "__"))
+        file_name = f"onnx/model_qint8_{quantization}.onnx"
+
+        if not os.path.exists(os.path.join(model_dir, file_name)):
+            from sentence_transformers import export_dynamic_quantized_onnx_model
+            logger.info(f"Exporting {model_name} to ONNX with {quantization} int8 quantization...")
+            model = SentenceTransformer(model_name, device="cpu", backend="onnx")
+            model.save(model_dir)
+            export_dynamic_quantized_onnx_model(model, quantization, model_dir)
+
+        self.model = SentenceTransformer(model_dir, device="cpu", backend="onnx", model_kwargs={"file_name": file_name})
+
+    @property
+    def identifier(self) -> str:
+        return f"{self.model_name}:onnx-qint8-{self.quantization}"
+
+
+def create_embedding_backend(model_name: str, backend: str = "torch") -> EmbeddingBackend:
+    backend = (backend or "torch").lower()
+    if backend == "onnx":
+        try:
+            embedder = OnnxEmbeddingBackend(model_name)
+        except ImportError as e:
+            logger.error(f"ONNX backend unavailable ({e}), falling back to torch. Install optimum[onnxruntime].")
+            embedder = TorchEmbeddingBackend(model_name)
+    elif backend == "torch":
+        embedder = TorchEmbeddingBackend(model_name)
+    else:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+    logger.info(f"Using {embedder.name} embedding backend for {model_name}")
+    return embedder
@@ -0,0 +1,33 @@
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Threads per replica for embedding and vector search. Torch and FAISS release
+# the GIL, so these run in parallel with each other and with the event loop.
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+
+_executor = None
+
+
+def get_inference_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+    return _executor
+
+
+async def run_inference(fn, *args, **kwargs):
+    """Run a CPU-bound call on the inference pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_inference_executor(), functools.partial(fn, *args, **kwargs))
+
+
+def shutdown_inference_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import logging
+import httpx
+from dotenv import load_dotenv
+from shared.utils.resilience import CircuitBreaker, LatencyTracker, RetryPolicy, hedged
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+API_ENDPOINT = os.getenv("API_ENDPOINT")
+API_KEY = os.getenv("API_KEY")
+
+# Connection pool and timeout settings (shared by every service)
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+
+# Retries with jittered exponential backoff on network errors, 429 and 5xx
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.2"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "2"))
+# Fail fast once the endpoint keeps failing, probe again after the reset timeout
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+# Send a duplicate request when the first is slower than the observed p95
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "2"))
+
+# Longest a single chat() call can take: every attempt timing out plus the backoff between them
+LLM_CALL_BUDGET = (LLM_RETRIES + 1) * (LLM_CONNECT_TIMEOUT + LLM_TIMEOUT) + LLM_RETRIES * LLM_RETRY_MAX_DELAY
+
+DEFAULT_HEADERS = {
+    "Content-Type": "application/json",
+    "api-key": API_KEY
+}
+
+
+def create_http_client(pool_size: int = LLM_POOL_SIZE, timeout: float = LLM_TIMEOUT,
+                       pool_timeout: float = None) -> httpx.AsyncClient:
+    """Create an AsyncClient with a bounded keep-alive connection pool.
+
+    `pool_timeout` is how long a request waits for a free connection
+    before raising httpx.PoolTimeout; it defaults to `timeout`.
+    """
+    limits = httpx.Limits(
+        max_connections=pool_size,
+        max_keepalive_connections=pool_size,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+    )
+    timeouts = httpx.Timeout(timeout, connect=LLM_CONNECT_TIMEOUT, pool=timeout if pool_timeout is None else pool_timeout)
+    return httpx.AsyncClient(limits=limits, timeout=timeouts)
+
+
+class LLMClient:
+    """Pooled client for the chat completions endpoint.
+
+    One instance is shared per process so every LLM call reuses the same
+    keep-alive connections instead of paying a TCP+TLS handshake each time.
+    Calls are retried with backoff, go through a circuit breaker and, when
+    LLM_HEDGE_ENABLED is set, are hedged after the observed p95 latency.
+    """
+
+    def __init__(self, endpoint: str = API_ENDPOINT, headers: dict = None,
+                 pool_size: int = LLM_POOL_SIZE, timeout: float = LLM_TIMEOUT):
+        self.endpoint = endpoint
+        # requests used to silently drop unset header values, httpx rejects them
+        self.headers = {k: v for k, v in (headers or DEFAULT_HEADERS).items() if v is not None}
+        self.timeout = timeout
+        self.client = create_http_client(pool_size, timeout)
+        self.retry = RetryPolicy(LLM_RETRIES, LLM_RETRY_BASE_DELAY, LLM_RETRY_MAX_DELAY)
+        self.breaker = CircuitBreaker("LLM", LLM_BREAKER_FAILURES, LLM_BREAKER_RESET)
+        self.latency = LatencyTracker()
+        self.hedge = LLM_HEDGE_ENABLED
+        self.hedged_requests = 0
+
+    def _hedge_delay(self):
+        p95 = self.latency.percentile(95)
+        return max(LLM_HEDGE_MIN_DELAY, p95) if p95 is not None else LLM_HEDGE_MIN_DELAY
+
+    async def chat(self, messages: list, tools: list = None, timeout: float = None,
+                   headers: dict = None, **params) -> dict:
+        """Send a chat completion request and return the decoded JSON body."""
+        payload = {"messages": messages, **params}
+        if tools:
+            payload["tools"] = tools
+            payload["tool_choice"] = "auto"
+
+        async def attempt():
+            started = time.perf_counter()
+            resp = await self.client.post(
+                self.endpoint,
+                headers=headers or self.headers,
+                json=payload,
+                timeout=timeout or self.timeout
+            )
+            resp.raise_for_status()
+            self.latency.observe(time.perf_counter() - started)
+            return resp.json()
+
+        async def hedged_attempt():
+            delay = self._hedge_delay()
+            started = time.perf_counter()
+            try:
+                return await hedged(attempt, delay)
+            finally:
+                if time.perf_counter() - started > delay:
+                    self.hedged_requests += 1
+
+        return await self.breaker.call(lambda: self.retry.run(hedged_attempt if self.hedge else attempt))
+
+    async def chat_message(self, messages: list, tools: list = None, timeout: float = None,
+                           headers: dict = None, **params) -> dict:
+        """Same as chat() but returns only the first choice's message."""
+        response = await self.chat(messages, tools=tools, timeout=timeout, headers=headers, **params)
+        return response["choices"][0]["message"]
+
+    async def stream_chat(self, messages: list, timeout: float = None, headers: dict = None, **params):
+        """Stream a chat completion, yielding content deltas as the LLM produces them."""
+        payload = {"messages": messages, "stream": True, **params}
+        # Tokens may already be forwarded, so streams go through the breaker but are not retried or hedged
+        async for content in self.breaker.stream(self._stream(payload, timeout, headers)):
+            yield content
+
+    async def _stream(self, payload, timeout, headers):
+        async with self.client.stream(
+            "POST",
+            self.endpoint,
+            headers=headers or self.headers,
+            json=payload,
+            timeout=timeout or self.timeout
+        ) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                for choice in chunk.get("choices", []):
+                    content = (choice.get("delta") or {}).get("content")
+                    if content:
+                        yield content
+
+    def stats(self) -> dict:
+        return {
+            "breaker": self.breaker.stats(),
+            "hedging": self.hedge,
+            "hedge_delay_s": round(self._hedge_delay(), 3),
+            "hedged_requests": self.hedged_requests,
+            "latency_p95_s": self.latency.percentile(95)
+        }
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_llm_client = None
+
+
+def get_llm_client() -> LLMClient:
+    global _llm_client
+    if _llm_client is None:
+        logger.info(f"Creating pooled LLM client (pool size: {LLM_POOL_SIZE}, timeout: {LLM_TIMEOUT}s)")
+        _llm_client = LLMClient()
+    return _llm_client
+
+
+async def close_llm_client():
+    global _llm_client
+    if _llm_client is not None:
+        await _llm_client.aclose()
+        _llm_client = None
@@ -0,0 +1,74 @@
+import time
+import asyncio
+from fastapi import Response
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+# LLM calls dominate, so buckets reach well past the usual web defaults
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 60)
+
+STAGE_LATENCY = Histogram(
+    "agent_swarm_stage_latency_seconds",
+    "Latency of each request stage",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+STAGE_IN_FLIGHT = Gauge(
+    "agent_swarm_stage_in_flight",
+    "Stage executions currently running",
+    ["stage"]
+)
+STAGE_ERRORS = Counter(
+    "agent_swarm_stage_errors_total",
+    "Stage executions that raised",
+    ["stage"]
+)
+
+# Items per MicroBatcher batch, by batcher name
+BATCH_SIZE = Histogram(
+    "agent_swarm_batch_size",
+    "Items processed per micro-batch",
+    ["batcher"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+
+
+class track_stage:
+    """Time a stage into the Prometheus metrics, as `with` or `async with`.
+
+    Exceptions are counted and re-raised. `duration_ms` holds the elapsed
+    time once the block exits, for attaching to responses.
+
+        with track_stage("retrieval") as stage:
+            docs = search(query)
+        logger.info(f"Retrieval took {stage.duration_ms} ms")
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.duration_ms = None
+        self._started = None
+
+    def __enter__(self):
+        STAGE_IN_FLIGHT.labels(self.stage).inc()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._started
+        self.duration_ms = round(elapsed * 1000, 1)
+        STAGE_LATENCY.labels(self.stage).observe(elapsed)
+        STAGE_IN_FLIGHT.labels(self.stage).dec()
+        # Cancelled prefetches and closed streams are not failures
+        if exc_type is not None and not issubclass(exc_type, (GeneratorExit, asyncio.CancelledError)):
+            STAGE_ERRORS.labels(self.stage).inc()
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+def metrics_response() -> Response:
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
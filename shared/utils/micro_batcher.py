@@ -0,0 +1,95 @@
+import asyncio
+import logging
+from collections import Counter
+from shared.utils.metrics import BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Groups concurrent single-item calls into one batched call.
+
+    submit() queues an item and waits for its result. A worker takes the
+    first queued item, keeps collecting for up to `max_wait_ms` or until
+    `max_batch_size` items are queued, then runs `process_batch(items)`
+    once in `executor` (the default thread pool if None). process_batch
+    must return one result per item, in order. Batch sizes are exported
+    to Prometheus under the `name` label.
+    """
+
+    def __init__(self, process_batch, max_batch_size: int = 16, max_wait_ms: float = 5, executor=None,
+                 name: str = "batch"):
+        self.process_batch = process_batch
+        self.name = name
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.executor = executor
+        self.batches = 0
+        self.items = 0
+        self.batch_sizes = Counter()
+        self._queue = None
+        self._worker = None
+
+    async def submit(self, item):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # Callers that gave up while queued don't need a slot in the batch
+        return [(item, future) for item, future in batch if not future.done()]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            self.batch_sizes[len(batch)] += 1
+            BATCH_SIZE.labels(self.name).observe(len(batch))
+
+            items = [item for item, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.process_batch, items)
+            except Exception as e:
+                logger.error(f"Batch of {len(items)} failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "batch_size_histogram": dict(sorted(self.batch_sizes.items()))
+        }
+
+    async def aclose(self):
+        if self._worker is not None:
+            self._worker.cancel()
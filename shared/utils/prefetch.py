@@ -0,0 +1,73 @@
+import time
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PrefetchStore:
+    """Speculative work started by the router, keyed by request ID.
+
+    An agent service starts a prefetch (e.g. a retrieval) while the router is
+    still classifying the message. If the agent is chosen, handle() takes the
+    result instead of recomputing it. Prefetches that lose are cancelled by
+    the router or expire after `ttl` seconds.
+    """
+
+    def __init__(self, ttl: float = 30, max_size: int = 1000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.cancelled = 0
+        self._tasks = {}  # request_id -> (task, expires_at)
+
+    def _sweep(self):
+        now = time.monotonic()
+        expired = [rid for rid, (_, expires_at) in self._tasks.items() if expires_at < now]
+        # Dicts keep insertion order, so the oldest entries are dropped first
+        overflow = max(0, len(self._tasks) - len(expired) - self.max_size + 1)
+        expired += [rid for rid in self._tasks if rid not in expired][:overflow]
+        for rid in expired:
+            self.cancel(rid)
+
+    def start(self, request_id: str, coro):
+        """Schedule `coro` for `request_id` unless one is already running."""
+        self._sweep()
+        if request_id in self._tasks:
+            coro.close()
+            return
+        task = asyncio.create_task(coro)
+        self._tasks[request_id] = (task, time.monotonic() + self.ttl)
+
+    async def take(self, request_id: str):
+        """Return the prefetched result, or None if there is none or it failed."""
+        entry = self._tasks.pop(request_id, None) if request_id else None
+        if entry is None:
+            self.misses += 1
+            return None
+        task, _ = entry
+        try:
+            result = await asyncio.shield(task)
+        except Exception as e:
+            logger.error(f"Prefetch for request {request_id} failed: {e}")
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def cancel(self, request_id: str) -> bool:
+        entry = self._tasks.pop(request_id, None)
+        if entry is None:
+            return False
+        entry[0].cancel()
+        self.cancelled += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._tasks),
+            "hits": self.hits,
+            "misses": self.misses,
+            "cancelled": self.cancelled
+        }
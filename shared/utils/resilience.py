@@ -0,0 +1,186 @@
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(httpx.HTTPError):
+    """Raised instead of calling an upstream whose circuit breaker is open.
+
+    Subclasses httpx.HTTPError so the existing error handling around
+    outbound calls (fallback answers, raw responses) applies unchanged.
+    """
+
+
+def is_retryable(error: Exception) -> bool:
+    """Network failures, timeouts, 429 and 5xx are worth retrying; other 4xx are not.
+
+    PoolTimeout means our own connection pool is exhausted, not that the
+    upstream failed, so it is neither retried nor counted by the breakers.
+    """
+    if isinstance(error, (CircuitOpenError, httpx.PoolTimeout)):
+        return False
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(error, httpx.TransportError)
+
+
+def is_connect_error(error: Exception) -> bool:
+    """The request never reached the server, so even non-idempotent calls can be retried."""
+    return isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout))
+
+
+class RetryPolicy:
+    """Retry with capped exponential backoff and full jitter."""
+
+    def __init__(self, retries: int = 2, base_delay: float = 0.2, max_delay: float = 2.0,
+                 retry_on=is_retryable):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_on = retry_on
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def run(self, call):
+        """Await call() until it succeeds, fails with a non-retryable error or runs out of retries."""
+        for attempt in range(self.retries + 1):
+            try:
+                return await call()
+            except Exception as e:
+                if attempt == self.retries or not self.retry_on(e):
+                    raise
+                delay = self.backoff(attempt)
+                logger.warning(f"Attempt {attempt + 1} failed ({type(e).__name__}: {e}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+
+class CircuitBreaker:
+    """Fails fast after `failure_threshold` consecutive failures.
+
+    While open, calls raise CircuitOpenError without touching the upstream.
+    After `reset_timeout` seconds one trial call is let through (half-open):
+    success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30,
+                 is_failure=is_retryable):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.is_failure = is_failure
+        self.state = "closed"
+        self.failures = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    def _before_call(self):
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                self.rejected += 1
+                raise CircuitOpenError(f"Circuit breaker for {self.name} is open")
+            self.state = "half_open"
+            logger.info(f"Circuit breaker for {self.name} is half-open, sending a trial call")
+        if self.state == "half_open":
+            if self._trial_in_flight:
+                self.rejected += 1
+                raise CircuitOpenError(f"Circuit breaker for {self.name} is half-open")
+            self._trial_in_flight = True
+
+    def _on_success(self):
+        if self.state != "closed":
+            logger.info(f"Circuit breaker for {self.name} closed")
+        self.state = "closed"
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def _on_failure(self):
+        self._trial_in_flight = False
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.error(f"Circuit breaker for {self.name} opened after {self.failures} failures")
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+    def _on_error(self, error: BaseException):
+        # Cancellations and client errors say nothing about the upstream's health
+        if isinstance(error, Exception) and self.is_failure(error):
+            self._on_failure()
+        else:
+            self._trial_in_flight = False
+
+    async def call(self, call):
+        self._before_call()
+        try:
+            result = await call()
+        except BaseException as e:
+            self._on_error(e)
+            raise
+        self._on_success()
+        return result
+
+    async def stream(self, stream):
+        """Pass an async iterator through the breaker; the outcome is known once it is exhausted."""
+        self._before_call()
+        try:
+            async for item in stream:
+                yield item
+        except BaseException as e:
+            self._on_error(e)
+            raise
+        self._on_success()
+
+    def stats(self) -> dict:
+        return {"name": self.name, "state": self.state, "consecutive_failures": self.failures, "rejected": self.rejected}
+
+
+class LatencyTracker:
+    """Rolling window of call latencies, used to pick the hedging delay."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, q: float):
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+async def hedged(call, delay: float):
+    """Await call(); if it hasn't finished after `delay` seconds, race a duplicate.
+
+    The first successful result wins and the other call is cancelled. Only
+    use this for idempotent calls.
+    """
+    first = asyncio.ensure_future(call())
+    done, _ = await asyncio.wait({first}, timeout=delay)
+    if done:
+        return first.result()
+
+    logger.info(f"No response after {delay:.2f}s, sending a hedged request")
+    pending = {first, asyncio.ensure_future(call())}
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
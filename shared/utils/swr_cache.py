@@ -0,0 +1,100 @@
+import time
+import asyncio
+import logging
+from shared.utils.ttl_cache import TTLCache
+from shared.utils.resilience import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+
+class StaleWhileRevalidateCache:
+    """Async cache that serves stale values while one background refresh runs.
+
+    get(key, fetch) returns a value younger than `ttl` straight away. A
+    value older than that, but younger than `ttl + stale_ttl`, is still
+    returned immediately, and `fetch()` is started in the background to
+    replace it. Otherwise the caller waits for `fetch()`. Concurrent
+    callers for the same key share one in-flight fetch. Only successful
+    fetches are cached; a failed refresh keeps the stale value, and no new
+    refresh is started for that key until a jittered exponential backoff
+    (at least `refresh_backoff` seconds) has passed, so an upstream outage
+    doesn't turn every stale hit into another request.
+    """
+
+    def __init__(self, ttl: float = 60, stale_ttl: float = 600, max_size: int = 256, refresh_backoff: float = 5):
+        self.ttl = ttl
+        self.refresh_backoff = RetryPolicy(base_delay=refresh_backoff, max_delay=stale_ttl)
+        self._refresh_failures = {}  # key -> (consecutive failures, monotonic time of the next allowed refresh)
+        self.entries = TTLCache(ttl=ttl + stale_ttl, max_size=max_size)  # key -> (fetched_at, value)
+        self.fresh_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self._in_flight = {}  # key -> task
+
+    def _fetch(self, key, fetch):
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._run_fetch(key, fetch))
+            self._in_flight[key] = task
+        else:
+            self.coalesced += 1
+        return task
+
+    async def _run_fetch(self, key, fetch):
+        try:
+            value = await fetch()
+            self.entries.set(key, (time.monotonic(), value))
+            return value
+        finally:
+            self._in_flight.pop(key, None)
+
+    def _refresh_done(self, key, task):
+        if task.cancelled():
+            return
+        if task.exception() is None:
+            self._refresh_failures.pop(key, None)
+            return
+        self.refresh_errors += 1
+        failures = self._refresh_failures.get(key, (0, 0.0))[0] + 1
+        delay = self.refresh_backoff.base_delay + self.refresh_backoff.backoff(failures - 1)
+        self._refresh_failures[key] = (failures, time.monotonic() + delay)
+        logger.error(f"Background refresh of {key!r} failed, serving stale value for at least {delay:.1f}s: {task.exception()}")
+
+    def _refresh_allowed(self, key):
+        failure = self._refresh_failures.get(key)
+        return failure is None or time.monotonic() >= failure[1]
+
+    async def get(self, key, fetch):
+        entry = self.entries.get(key)
+        if entry is not None:
+            fetched_at, value = entry
+            if time.monotonic() - fetched_at < self.ttl:
+                self.fresh_hits += 1
+            else:
+                self.stale_hits += 1
+                if key not in self._in_flight and self._refresh_allowed(key):
+                    self.refreshes += 1
+                    self._fetch(key, fetch).add_done_callback(lambda task: self._refresh_done(key, task))
+            return value
+
+        self.misses += 1
+        self._refresh_failures.pop(key, None)
+        # Shielded so a caller that gives up doesn't cancel the fetch others are waiting on
+        return await asyncio.shield(self._fetch(key, fetch))
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.entries),
+            "ttl": self.ttl,
+            "fresh_hits": self.fresh_hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "refreshes_backing_off": len(self._refresh_failures),
+            "in_flight": len(self._in_flight)
+        }
@@ -0,0 +1,64 @@
+import os
+import json
+import asyncio
+import logging
+from dotenv import load_dotenv
+from shared.utils.metrics import track_stage
+from shared.utils.tools import db_query, contact_support, send_slack_notification, get_news, duckduckgo_tool
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Seconds each tool call may take before its result is replaced by a timeout message
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "15"))
+
+# Tool names come from the LLM, so only these are used as metric labels to keep cardinality bounded
+KNOWN_TOOL_NAMES = {
+    tool["function"]["name"]
+    for tool in (db_query, contact_support, send_slack_notification, get_news, duckduckgo_tool)
+}
+
+
+async def _run_tool_call(tool_call, dispatch, timeout):
+    function_name = tool_call["function"]["name"]
+    try:
+        function_args = json.loads(tool_call["function"]["arguments"] or "{}")
+    except json.JSONDecodeError as e:
+        logger.error(f"Invalid arguments for {function_name}: {e}")
+        return {"tool_name": function_name, "Response": f"Invalid arguments for {function_name}."}
+
+    logger.info(f"Executing tool : {function_name}")
+    try:
+        stage = f"tool:{function_name}" if function_name in KNOWN_TOOL_NAMES else "tool:unknown"
+        with track_stage(stage):
+            result = await asyncio.wait_for(dispatch(function_name, function_args), timeout)
+    except asyncio.TimeoutError:
+        logger.error(f"{function_name} timed out after {timeout}s")
+        return {"tool_name": function_name, "Response": f"{function_name} did not respond in time."}
+    except Exception as e:
+        logger.error(f"Error executing {function_name}: {e}")
+        return {"tool_name": function_name, "Response": f"Error executing {function_name}: {e}"}
+
+    if isinstance(result, dict) and "Response" in result:
+        return result
+    return {"tool_name": function_name, "Response": result}
+
+
+async def run_tool_calls(tool_calls: list, dispatch, timeout: float = TOOL_TIMEOUT) -> dict:
+    """Run every tool call from an LLM message concurrently and merge their results.
+
+    `dispatch(function_name, function_args)` is awaited once per call, each
+    under its own timeout, so the calls together take as long as the slowest
+    one. A single call returns its result unchanged; several are merged into
+    one {"tool_name", "Response"} with the individual results under
+    "tool_results".
+    """
+    results = await asyncio.gather(*[_run_tool_call(tool_call, dispatch, timeout) for tool_call in tool_calls])
+    if len(results) == 1:
+        return results[0]
+    return {
+        "tool_name": ", ".join(result.get("tool_name", "") for result in results),
+        "Response": "\n\n".join(str(result["Response"]) for result in results),
+        "tool_results": results
+    }
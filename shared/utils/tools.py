@@ -2,18 +2,21 @@ db_query = {
         "type": "function",
         "function": {
             "name": "db_query_tool",
-            "description": "Retrieve a single field for a user from the database",
+            "description": "Retrieve one or more fields for a user from the database in a single call",
             "parameters": {
                 "type": "object",
                 "properties": {
                     "user_id": {"type": "string", "description": "The user's unique identifier"},
-                    "field": {
-                        "type": "string", 
-                        "enum": ["email", "user_name", "payment_status", "order_status"],
-                        "description": "The database column to retrieve"
+                    "fields": {
+                        "type": "array",
+                        "items": {
+                            "type": "string",
+                            "enum": ["email", "user_name", "payment_status", "order_status"]
+                        },
+                        "description": "Every database column the question needs"
                     }
                 },
-                "required": ["user_id", "field"]
+                "required": ["user_id", "fields"]
             }
         }
     }